@@ -0,0 +1,24 @@
+from typing import Any, Callable, Dict
+from langchain_core.runnables import RunnableConfig
+
+
+def instance_node(method_name: str) -> Callable:
+    """
+    Create a graph node that dispatches to a method of the running workflow
+
+    The compiled graphs are shared by every instance of a workflow class, so the
+    nodes cannot close over `self`. Instead the instance is passed at invocation
+    time with `config={"configurable": {"workflow": self}}`.
+
+    Args:
+        method_name: Name of the async node method on the workflow
+
+    Returns:
+        Callable: Async node function
+    """
+    async def node(state: Dict[str, Any], config: RunnableConfig) -> Any:
+        workflow = config["configurable"]["workflow"]
+        return await getattr(workflow, method_name)(state)
+
+    node.__name__ = method_name
+    return node
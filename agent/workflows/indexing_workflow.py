@@ -1,6 +1,9 @@
 import os
 import asyncio
-from typing import Dict, Any, Literal
+import contextlib
+import functools
+import httpx
+from typing import Dict, Any, BinaryIO, Literal, Optional, Union
 from langgraph.graph import StateGraph, END
 from typing_extensions import TypedDict
 from loguru import logger
@@ -10,12 +13,16 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from workers.index_intent import IndexIntent
 from workers.index_knowledge import IndexKnowledge
+from workers.retriever import Retriever
+from workers.intent_classification import IntentClassification
+from workers.http_client import get_client
+from agent.workflows.graph_utils import instance_node
 
 
 class IndexingState(TypedDict):
     """State for the indexing workflow"""
     index_type: str
-    csv_file_path: str
+    csv_file_path: Union[str, BinaryIO]  # Path, or an open file such as an upload
     success: bool
     message: str
     document_count: int
@@ -23,27 +30,33 @@ class IndexingState(TypedDict):
 
 
 class IndexingWorkflow:
-    def __init__(self, base_url: str = "http://localhost:8001"):
+    def __init__(self, base_url: str = "http://localhost:8001", client: Optional[httpx.AsyncClient] = None):
         """
         Initialize IndexingWorkflow with base URL for the tools API
         
         Args:
             base_url: Base URL for the tools and services API
+            client: Shared HTTP client used by the indexers
         """
         self.base_url = base_url
-        self.intent_indexer = IndexIntent(base_url)
-        self.knowledge_indexer = IndexKnowledge(base_url)
+        self.client = client
+        self.intent_indexer = IndexIntent(base_url, client)
+        self.knowledge_indexer = IndexKnowledge(base_url, client)
+        # The indexers are long-lived; runs into the same collection are serialized
+        self._locks = {"intent": asyncio.Lock(), "knowledge": asyncio.Lock()}
         self.graph = self._build_graph()
 
-    def _build_graph(self) -> StateGraph:
-        """Build the LangGraph workflow"""
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _build_graph(cls) -> StateGraph:
+        """Build and compile the LangGraph workflow once per class"""
         workflow = StateGraph(IndexingState)
         
         # Add nodes
-        workflow.add_node("validate_input", self._validate_input)
-        workflow.add_node("index_intent", self._index_intent)
-        workflow.add_node("index_knowledge", self._index_knowledge)
-        workflow.add_node("get_stats", self._get_stats)
+        workflow.add_node("validate_input", instance_node("_validate_input"))
+        workflow.add_node("index_intent", instance_node("_index_intent"))
+        workflow.add_node("index_knowledge", instance_node("_index_knowledge"))
+        workflow.add_node("get_stats", instance_node("_get_stats"))
         
         # Define the workflow
         workflow.set_entry_point("validate_input")
@@ -51,7 +64,7 @@ class IndexingWorkflow:
         # Conditional routing based on index_type
         workflow.add_conditional_edges(
             "validate_input",
-            self._route_indexing,
+            cls._route_indexing,
             {
                 "intent": "index_intent",
                 "knowledge": "index_knowledge",
@@ -66,26 +79,30 @@ class IndexingWorkflow:
         
         return workflow.compile()
 
-    async def _validate_input(self, state: IndexingState) -> IndexingState:
+    async def _validate_input(self, state: IndexingState) -> Dict[str, Any]:
         """Validate input parameters"""
         logger.info(f"Validating input: index_type={state['index_type']}, csv_file_path={state['csv_file_path']}")
         
         # Check index_type
         if state["index_type"] not in ["intent", "knowledge"]:
-            state["success"] = False
-            state["message"] = f"Invalid index_type: {state['index_type']}. Must be 'intent' or 'knowledge'"
-            return state
+            return {
+                "success": False,
+                "message": f"Invalid index_type: {state['index_type']}. Must be 'intent' or 'knowledge'"
+            }
         
-        # Check if CSV file exists
-        if not os.path.exists(state["csv_file_path"]):
-            state["success"] = False
-            state["message"] = f"CSV file not found: {state['csv_file_path']}"
-            return state
+        # Check if CSV file exists (a single stat, directories are rejected too);
+        # the indexers open it directly without checking again
+        if isinstance(state["csv_file_path"], str) and not os.path.isfile(state["csv_file_path"]):
+            return {
+                "success": False,
+                "message": f"CSV file not found: {state['csv_file_path']}"
+            }
         
         logger.info("Input validation passed")
-        return state
+        return {}
 
-    def _route_indexing(self, state: IndexingState) -> str:
+    @staticmethod
+    def _route_indexing(state: IndexingState) -> str:
         """Route to appropriate indexing node based on index_type"""
         if not state.get("success", True):
             return "error"
@@ -97,49 +114,47 @@ class IndexingWorkflow:
         else:
             return "error"
 
-    async def _index_intent(self, state: IndexingState) -> IndexingState:
+    async def _index_intent(self, state: IndexingState) -> Dict[str, Any]:
         """Index intent queries"""
         logger.info("Starting intent indexing...")
         
         try:
             result = await self.intent_indexer.run(state["csv_file_path"])
+            logger.info(f"Intent indexing completed: {result['success']}")
             
-            state["success"] = result["success"]
-            state["message"] = result["message"]
-            if "document_count" in result:
-                state["document_count"] = result["document_count"]
+            # New intent queries (even from a run that failed halfway) make cached labels stale
+            IntentClassification.bump_index_version()
             
-            logger.info(f"Intent indexing completed: {state['success']}")
+            update = {"success": result["success"], "message": result["message"]}
+            if "document_count" in result:
+                update["document_count"] = result["document_count"]
+            return update
             
         except Exception as e:
             logger.error(f"Intent indexing failed: {e}")
-            state["success"] = False
-            state["message"] = f"Intent indexing failed: {str(e)}"
-        
-        return state
+            return {"success": False, "message": f"Intent indexing failed: {str(e)}"}
 
-    async def _index_knowledge(self, state: IndexingState) -> IndexingState:
+    async def _index_knowledge(self, state: IndexingState) -> Dict[str, Any]:
         """Index knowledge base"""
         logger.info("Starting knowledge indexing...")
         
         try:
             result = await self.knowledge_indexer.run(state["csv_file_path"])
+            logger.info(f"Knowledge indexing completed: {result['success']}")
             
-            state["success"] = result["success"]
-            state["message"] = result["message"]
-            if "document_count" in result:
-                state["document_count"] = result["document_count"]
+            # New documents (even from a run that failed halfway) make cached vector results stale
+            Retriever.bump_index_version()
             
-            logger.info(f"Knowledge indexing completed: {state['success']}")
+            update = {"success": result["success"], "message": result["message"]}
+            if "document_count" in result:
+                update["document_count"] = result["document_count"]
+            return update
             
         except Exception as e:
             logger.error(f"Knowledge indexing failed: {e}")
-            state["success"] = False
-            state["message"] = f"Knowledge indexing failed: {str(e)}"
-        
-        return state
+            return {"success": False, "message": f"Knowledge indexing failed: {str(e)}"}
 
-    async def _get_stats(self, state: IndexingState) -> IndexingState:
+    async def _get_stats(self, state: IndexingState) -> Dict[str, Any]:
         """Get collection statistics"""
         logger.info("Getting collection statistics...")
         
@@ -150,25 +165,24 @@ class IndexingWorkflow:
                 stats_result = await self.knowledge_indexer.get_stats_collection()
             
             if stats_result["success"]:
-                state["stats"] = stats_result["stats"]
-                logger.info(f"Collection stats: {state['stats']}")
+                logger.info(f"Collection stats: {stats_result['stats']}")
+                return {"stats": stats_result["stats"]}
             else:
                 logger.warning("Failed to get collection stats")
-                state["stats"] = {}
+                return {"stats": {}}
                 
         except Exception as e:
             logger.error(f"Failed to get stats: {e}")
-            state["stats"] = {}
-        
-        return state
+            return {"stats": {}}
 
-    async def run(self, index_type: Literal["intent", "knowledge"], csv_file_path: str) -> Dict[str, Any]:
+    async def run(self, index_type: Literal["intent", "knowledge"],
+                  csv_file_path: Union[str, BinaryIO]) -> Dict[str, Any]:
         """
         Run the indexing workflow
         
         Args:
             index_type: Type of indexing ('intent' or 'knowledge')
-            csv_file_path: Path to the CSV file to index
+            csv_file_path: Path to the CSV file to index, or the open file itself
             
         Returns:
             Dict containing success status, message, document count, and stats
@@ -186,8 +200,14 @@ class IndexingWorkflow:
         )
         
         try:
-            # Run the workflow
-            result = await self.graph.ainvoke(initial_state)
+            # Run the workflow, an unknown index_type is rejected by validate_input
+            lock = self._locks.get(index_type)
+            if lock is not None and lock.locked():
+                logger.info(f"Waiting for the running {index_type} indexing to finish")
+            async with lock or contextlib.nullcontext():
+                result = await self.graph.ainvoke(
+                    initial_state, config={"configurable": {"workflow": self}}
+                )
             
             return {
                 "success": result["success"],
@@ -205,6 +225,16 @@ class IndexingWorkflow:
                 "stats": {}
             }
 
+    async def warmup(self):
+        """Prime the connection to the tools API, failures are logged and ignored"""
+        try:
+            async with get_client(self.client) as client:
+                response = await client.get(f"{self.base_url}/health", timeout=5.0)
+                response.raise_for_status()
+            logger.info("Indexing workflow warmed up")
+        except Exception as e:
+            logger.warning(f"Indexing workflow warmup failed: {e}")
+
     def health_check(self) -> Dict[str, str]:
         """Health check for indexing workflow"""
         try:
@@ -1,5 +1,11 @@
-from typing import Dict, Any, TypedDict, Annotated, Literal
+from typing import Dict, Any, TypedDict, Annotated, Literal, Optional, List, Set, Tuple, AsyncGenerator
 import asyncio
+import functools
+import hashlib
+import itertools
+import re
+import uuid
+import httpx
 from loguru import logger
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
@@ -15,14 +21,43 @@ from workers.retriever import Retriever
 from workers.reflection import Reflection
 from workers.answer import Answer
 from workers.save_conversation import SaveConversation
+from workers.http_client import get_client
+from workers.cache import LRUCache, SemanticCache, normalize_query
+from agent.workflows.graph_utils import instance_node
+
+
+_WORD_PATTERN = re.compile(r"\s*\S+\s*")
+
+
+def _word_chunks(text: str, words_per_chunk: int = 3):
+    """Split text into chunks of a few words, whitespace included, without building a word list"""
+    words = _WORD_PATTERN.finditer(text)
+    while True:
+        chunk = "".join(match.group() for match in itertools.islice(words, words_per_chunk))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _LeaderCancelled(Exception):
+    """The in-flight run an identical request joined was cancelled, the joiner runs on its own"""
 
 
 class MedicalWorkflowState(TypedDict):
-    """State schema for the medical workflow"""
+    """
+    State schema for the medical workflow
+    
+    Nodes return only the keys they change, LangGraph merges them into the
+    channels, so the state (and the large retrieval results) is never copied.
+    """
     # Input data
+    request_id: str
     query: str
     user_id: str
     conversation_id: str
+    defer_save: bool
+    defer_answer: bool
+    chat_history: Optional[List[Dict[str, Any]]]  # Fetched by the cache lookup, None if not yet
     
     # Intermediate processing data
     intent: str
@@ -30,240 +65,568 @@ class MedicalWorkflowState(TypedDict):
     retriever_results: Dict[str, Any]
     sufficient: bool
     follow_up_query: str
-    second_retrieval_results: Dict[str, Any]
     combined_results: Dict[str, Any]
     
     # Output data
     answer_text: str
+    used_history: bool
     save_result: Dict[str, Any]
 
 
 class MedicalWorkflow:
     """Medical workflow using LangGraph for agentic RAG chatbot"""
     
-    def __init__(self, base_url: str = "http://localhost:8001"):
+    def __init__(self, base_url: str = "http://localhost:8001", client: Optional[httpx.AsyncClient] = None):
         """
         Initialize MedicalWorkflow with workers
         
         Args:
             base_url: Base URL for the tools and services API
+            client: Shared HTTP client used by all workers
         """
         self.base_url = base_url
+        self.client = client
         
         # Initialize workers
-        self.intent_classifier = IntentClassification(base_url)
-        self.query_generator = StructuredQueryGenerator(base_url)
-        self.retriever = Retriever(base_url)
-        self.reflection = Reflection(base_url)
-        self.answer_worker = Answer(base_url)
-        self.save_conversation = SaveConversation(base_url)
+        self.intent_classifier = IntentClassification(base_url, client)
+        self.query_generator = StructuredQueryGenerator(base_url, client)
+        self.retriever = Retriever(base_url, client)
+        self.reflection = Reflection(base_url, client)
+        self.answer_worker = Answer(base_url, client)
+        self.save_conversation = SaveConversation(base_url, client)
+        
+        # Web and vector searches started during intent classification, by request_id
+        # The web search runs a headless browser on the tools API that completes even when the
+        # prefetch is discarded, so unclassified queries are only prefetched when enabled
+        self.prefetch_web_search = os.getenv('PREFETCH_WEB_SEARCH', 'false').lower() == 'true'
+        self._prefetch_tasks: Dict[str, Dict[str, asyncio.Task]] = {}
+        
+        # Runs of the workflow in progress, joined by identical concurrent requests
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+        # Conversation saves running after their answer was returned, awaited by close()
+        self._pending_saves: Set[asyncio.Task] = set()
+        
+        # Optional query run end to end at startup, so the first user request finds every model hot
+        self.warmup_query = os.getenv('WARMUP_QUERY', '')
+        
+        # Answers of earlier queries, by exact (user, conversation, latest turn, query) and by query
+        # embedding similarity; the latest turn is part of the exact key because the answer depends on the history
+        self.answer_cache = LRUCache(
+            int(os.getenv('ANSWER_CACHE_SIZE', 10000)),
+            ttl=float(os.getenv('ANSWER_CACHE_TTL', 3600))
+        )
+        self.semantic_cache = SemanticCache(
+            maxsize=int(os.getenv('SEMANTIC_CACHE_SIZE', 10000)),
+            threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.95)),
+            ttl=float(os.getenv('SEMANTIC_CACHE_TTL', 3600))
+        )
+        # The semantic cache is shared by all users, so it only holds answers generated without
+        # history and is only read for conversations without history; short follow-ups
+        # ("what about children?") are never matched semantically either
+        self.semantic_cache_min_words = int(os.getenv('SEMANTIC_CACHE_MIN_WORDS', 3))
         
         # Build the workflow graph
         self.workflow = self._build_workflow()
     
-    def _build_workflow(self) -> StateGraph:
-        """Build the LangGraph workflow"""
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _build_workflow(cls) -> StateGraph:
+        """Build and compile the LangGraph workflow once per class"""
         # Create workflow graph
         workflow = StateGraph(MedicalWorkflowState)
         
         # Add nodes
-        workflow.add_node("classify_intent", self._classify_intent_node)
-        workflow.add_node("generate_structured_query", self._generate_structured_query_node)
-        workflow.add_node("retrieve_information", self._retrieve_information_node)
-        workflow.add_node("check_reflection", self._check_reflection_node)
-        workflow.add_node("retrieve_more_information", self._retrieve_more_information_node)
-        workflow.add_node("generate_general_answer", self._generate_general_answer_node)
-        workflow.add_node("generate_medical_answer", self._generate_medical_answer_node)
-        workflow.add_node("save_conversation", self._save_conversation_node)
+        workflow.add_node("classify_intent", instance_node("_classify_intent_node"))
+        workflow.add_node("retrieve_context", instance_node("_retrieve_context_node"))
+        workflow.add_node("generate_general_answer", instance_node("_generate_general_answer_node"))
+        workflow.add_node("generate_medical_answer", instance_node("_generate_medical_answer_node"))
+        workflow.add_node("save_conversation", instance_node("_save_conversation_node"))
         
         # Set entry point
         workflow.set_entry_point("classify_intent")
         
-        # Add conditional edges
+        # Add conditional edges, the classifier only returns "general" or "medical"
         workflow.add_conditional_edges(
             "classify_intent",
-            self._route_by_intent,
+            lambda state: state["intent"],
             {
                 "general": "generate_general_answer",
-                "medical": "generate_structured_query"
+                "medical": "retrieve_context"
             }
         )
         
-        workflow.add_edge("generate_structured_query", "retrieve_information")
-        workflow.add_edge("retrieve_information", "check_reflection")
+        workflow.add_edge("retrieve_context", "generate_medical_answer")
         
+        # Saving is skipped when the caller persists the conversation itself
         workflow.add_conditional_edges(
-            "check_reflection",
-            self._check_if_sufficient,
+            "generate_general_answer",
+            cls._route_after_answer,
             {
-                "sufficient": "generate_medical_answer",
-                "insufficient": "retrieve_more_information"
+                "save": "save_conversation",
+                "end": END
+            }
+        )
+        workflow.add_conditional_edges(
+            "generate_medical_answer",
+            cls._route_after_answer,
+            {
+                "save": "save_conversation",
+                "end": END
             }
         )
-        
-        workflow.add_edge("retrieve_more_information", "generate_medical_answer")
-        workflow.add_edge("generate_general_answer", "save_conversation")
-        workflow.add_edge("generate_medical_answer", "save_conversation")
         workflow.add_edge("save_conversation", END)
         
         return workflow.compile()
     
     # Node functions
     async def _classify_intent_node(self, state: MedicalWorkflowState) -> Dict[str, Any]:
-        """Classify intent of user query"""
-        logger.info(f"Classifying intent for query: {state['query']}")
-        intent = await self.intent_classifier.run(state["query"])
-        logger.info(f"Intent classified as: {intent}")
-        return {"intent": intent}
+        """
+        Classify intent of user query and generate the structured query
+        
+        Most queries are medical, so the structured query is generated, the vector
+        search on it is started as soon as it is ready and the web search on the raw
+        query is started while the intent is being classified, for queries already
+        known to be medical (and speculatively for unknown ones if PREFETCH_WEB_SEARCH
+        is set). All of them are discarded if the intent is general.
+        """
+        logger.info("Classifying intent for query: {}", state['query'])
+        query_task = asyncio.create_task(self.query_generator.run(state["query"]))
+        prefetch = {"vector": asyncio.create_task(self._prefetch_vector_search(query_task))}
+        # A discarded web search still holds a browser slot on the tools API until it finishes
+        cached_intent = self.intent_classifier.cached_label(state["query"])
+        if cached_intent == "medical" or (cached_intent is None and self.prefetch_web_search):
+            prefetch["web"] = asyncio.create_task(
+                self.retriever.run(state["query"], web_search=True, vector_search=False)
+            )
+        self._prefetch_tasks[state["request_id"]] = prefetch
+        
+        try:
+            intent = await self.intent_classifier.run(state["query"])
+        except BaseException:
+            query_task.cancel()
+            self._discard_prefetch(state["request_id"])
+            raise
+        logger.info("Intent classified as: {}", intent)
+        
+        if intent == "general":
+            query_task.cancel()
+            self._discard_prefetch(state["request_id"])
+            return {"intent": intent}
+        
+        structured_query = await query_task
+        logger.info("Structured query generated: {}", structured_query)
+        return {"intent": intent, "structured_query": structured_query}
     
-    async def _generate_structured_query_node(self, state: MedicalWorkflowState) -> Dict[str, Any]:
-        """Generate structured query from user input"""
-        logger.info("Generating structured query")
-        structured_query = await self.query_generator.run(state["query"])
-        logger.info(f"Structured query generated: {structured_query}")
-        return {"structured_query": structured_query}
+    async def _prefetch_vector_search(self, query_task: asyncio.Task) -> Dict[str, Any]:
+        """Run the vector search on the structured query once it has been generated"""
+        # Shielded, discarding the prefetch must not cancel the query the node waits for
+        structured_query = await asyncio.shield(query_task)
+        return await self.retriever.run(structured_query, web_search=False, vector_search=True)
     
-    async def _retrieve_information_node(self, state: MedicalWorkflowState) -> Dict[str, Any]:
-        """Retrieve information using the structured query"""
-        logger.info("Retrieving information with web_search=True, vector_search=True")
-        results = await self.retriever.run(
-            state["structured_query"], 
-            web_search=True, 
-            vector_search=True
-        )
-        logger.info(f"Retrieved {len(results)} result types")
-        return {"retriever_results": results}
+    def _discard_prefetch(self, request_id: str):
+        """Cancel the prefetched searches of a request, if any"""
+        for task in self._prefetch_tasks.pop(request_id, {}).values():
+            if task.done():
+                # Retrieve the outcome so a failed prefetch is not reported as never retrieved
+                if not task.cancelled():
+                    task.exception()
+            else:
+                task.cancel()
     
-    async def _check_reflection_node(self, state: MedicalWorkflowState) -> Dict[str, Any]:
-        """Check if retrieved information is sufficient"""
+    async def _retrieve_context_node(self, state: MedicalWorkflowState) -> Dict[str, Any]:
+        """
+        Retrieve information, check if it is sufficient and retrieve more if not
+        
+        The whole medical retrieval runs in one graph step, the intermediate results
+        stay local until the single state update.
+        """
+        # Use the prefetched vector and web searches if they were started
+        prefetch = self._prefetch_tasks.pop(state["request_id"], {})
+        web_task = prefetch.get("web")
+        if web_task is None:
+            logger.info("Searching the web with the structured query")
+            web_task = self.retriever.run(state["structured_query"], web_search=True, vector_search=False)
+        vector_task = prefetch.get("vector")
+        if vector_task is None:
+            vector_task = self.retriever.run(state["structured_query"], web_search=False, vector_search=True)
+        
+        web_results, vector_results = await asyncio.gather(web_task, vector_task)
+        results = {**web_results, **vector_results}
+        logger.info("Retrieved {} result types", len(results))
+        
         logger.info("Checking reflection")
-        result = await self.reflection.run(
-            state["structured_query"], 
-            state["retriever_results"]
-        )
-        logger.info(f"Reflection result - sufficient: {result['sufficient']}")
+        reflection = await self.reflection.run(state["structured_query"], results)
+        logger.info("Reflection result - sufficient: {}", reflection['sufficient'])
+        
+        # The first retrieval is the answer context unless more information is fetched
+        combined = results
+        if not reflection["sufficient"]:
+            combined = await self._retrieve_more_information(reflection["follow_up_query"], results)
         return {
-            "sufficient": result["sufficient"],
-            "follow_up_query": result["follow_up_query"]
+            "retriever_results": results,
+            "sufficient": reflection["sufficient"],
+            "follow_up_query": reflection["follow_up_query"],
+            "combined_results": combined
         }
     
-    async def _retrieve_more_information_node(self, state: MedicalWorkflowState) -> Dict[str, Any]:
-        """Retrieve additional information using follow-up query"""
+    async def _retrieve_more_information(self, follow_up_query: str, results: Dict[str, Any]) -> Dict[str, Any]:
+        """Retrieve additional information using follow-up query and combine it with the first results"""
         logger.info("Retrieving more information with web_search=True, vector_search=False")
-        results = await self.retriever.run(
-            state["follow_up_query"], 
+        more_results = await self.retriever.run(
+            follow_up_query, 
             web_search=True, 
             vector_search=False
         )
         
-        # Combine results from both retrievals
+        # Combine results from both retrievals, follow-up web results win on the same query
         combined = {
-            "web_search": {},
-            "vector_search": state["retriever_results"].get("vector_search", [])
+            "web_search": {
+                **results.get("web_search", {}),
+                **more_results.get("web_search", {})
+            },
+            "vector_search": results.get("vector_search", [])
         }
-        
-        # Merge web search results
-        web_search_1 = state["retriever_results"].get("web_search", {})
-        web_search_2 = results.get("web_search", {})
-        
-        for query, results_list in web_search_1.items():
-            combined["web_search"][query] = results_list
-        
-        for query, results_list in web_search_2.items():
-            combined["web_search"][query] = results_list
-        
+
         logger.info("Combined retrieval results")
-        return {
-            "second_retrieval_results": results,
-            "combined_results": combined
-        }
+        return combined
     
     async def _generate_general_answer_node(self, state: MedicalWorkflowState) -> Dict[str, Any]:
         """Generate general answer without context"""
+        if state["defer_answer"]:
+            return {}
         logger.info("Generating general answer")
-        self.answer_worker.set_user_info(state["user_id"], state["conversation_id"])
         result = await self.answer_worker.run(
             query=state["query"],
-            service_name="general"
+            service_name="general",
+            user_id=state["user_id"],
+            conversation_id=state["conversation_id"],
+            chat_history=state["chat_history"]
         )
         logger.info("General answer generated")
-        return {"answer_text": result["answer"]}
+        return {"answer_text": result["answer"], "used_history": result.get("used_history", True)}
     
     async def _generate_medical_answer_node(self, state: MedicalWorkflowState) -> Dict[str, Any]:
         """Generate medical answer with context"""
+        if state["defer_answer"]:
+            return {}
         logger.info("Generating medical answer with context")
-        self.answer_worker.set_user_info(state["user_id"], state["conversation_id"])
-        
-        # Use combined results if available, otherwise use retriever_results
-        context = state.get("combined_results") or state["retriever_results"]
-        
         result = await self.answer_worker.run(
             query=state["query"],
             service_name="answer",
-            context=context
+            context=state["combined_results"],
+            user_id=state["user_id"],
+            conversation_id=state["conversation_id"],
+            chat_history=state["chat_history"]
         )
         logger.info("Medical answer generated")
-        return {"answer_text": result["answer"]}
+        return {"answer_text": result["answer"], "used_history": result.get("used_history", True)}
     
     async def _save_conversation_node(self, state: MedicalWorkflowState) -> Dict[str, Any]:
-        """Save conversation to database"""
-        logger.info("Saving conversation")
-        result = await self.save_conversation.run(
-            user_id=state["user_id"],
-            conversation_id=state["conversation_id"],
-            query=state["query"],
-            answer=state["answer_text"]
-        )
-        logger.info("Conversation saved")
-        return {"save_result": result}
+        """Save conversation to database in the background, the answer does not wait for it"""
+        logger.info("Scheduling conversation save")
+        self.save_in_background(state["user_id"], state["conversation_id"], state["query"], state["answer_text"])
+        return {"save_result": {"success": True, "message": "Conversation save scheduled"}}
     
     # Edge routing functions
-    def _route_by_intent(self, state: MedicalWorkflowState) -> Literal["general", "medical"]:
-        """Route workflow based on intent classification"""
-        return "general" if state["intent"] == "general" else "medical"
+    @staticmethod
+    def _route_after_answer(state: MedicalWorkflowState) -> Literal["save", "end"]:
+        """Route to saving the conversation unless it is deferred to the caller"""
+        return "end" if state.get("defer_save") else "save"
     
-    def _check_if_sufficient(self, state: MedicalWorkflowState) -> Literal["sufficient", "insufficient"]:
-        """Route based on sufficiency of retrieved information"""
-        return "sufficient" if state["sufficient"] else "insufficient"
+    @staticmethod
+    def _digest(*parts: str) -> bytes:
+        """Hash identifiers and a query into a compact key"""
+        return hashlib.blake2b("|".join(parts).encode(), digest_size=16).digest()
     
-    async def run(self, query: str, user_id: str, conversation_id: str) -> Dict[str, Any]:
+    async def _cached_result(self, cached: Dict[str, str], query: str, user_id: str,
+                             conversation_id: str, defer_save: bool) -> Dict[str, Any]:
+        """Build the workflow result for a cached answer, saving the turn unless deferred"""
+        result = {"query": query, "user_id": user_id, "conversation_id": conversation_id, **cached}
+        if not defer_save:
+            self.save_in_background(user_id, conversation_id, query, cached["answer_text"])
+            result["save_result"] = {"success": True, "message": "Conversation save scheduled"}
+        return result
+    
+    async def _lookup_cache(self, query: str, user_id: str, conversation_id: str
+                            ) -> Tuple[Optional[Dict[str, str]], bytes, Optional[List[float]], Optional[List[Dict]]]:
         """
-        Run the medical workflow with the given inputs
+        Look up an earlier answer to the query
+        
+        A question repeated at the same point of a conversation (same latest turn)
+        is an exact hit, a near-duplicate of an earlier history-free query a semantic
+        one, only for a conversation without history. The query embedding is reused
+        by the intent classifier on a miss.
         
-        Args:
-            query: User's query text
-            user_id: User identifier
-            conversation_id: Conversation identifier
-            
         Returns:
-            Dict containing the final state of the workflow
+            Tuple of the cached intent and answer (None on a miss), the exact cache key,
+            the query embedding (None if the semantic cache was not consulted) and the
+            conversation history, passed on to the answer
         """
-        logger.info(f"Starting medical workflow for query: {query}")
+        history = await self.answer_worker.get_conversation_history(user_id, conversation_id)
+        latest_turn = f"{history[-1].get('query', '')}\0{history[-1].get('answer', '')}" if history else ""
+        answer_key = self._digest(user_id, conversation_id, latest_turn, normalize_query(query))
+        cached = self.answer_cache.get(answer_key)
+        if cached is not None:
+            logger.info("Answer cache hit")
+            return cached, answer_key, None, history
         
+        embedding = None
+        # Answers shared across users must not stand in for one built on this history
+        if not history and self.semantic_cache.maxsize > 0 and len(query.split()) >= self.semantic_cache_min_words:
+            try:
+                embedding = await self.intent_classifier.embed(query)
+                cached = self.semantic_cache.get(embedding)
+            except Exception as e:
+                logger.warning(f"Semantic cache lookup failed: {e}")
+            if cached is not None:
+                logger.info("Semantic cache hit")
+                self.answer_cache.set(answer_key, cached)
+        return cached, answer_key, embedding, history
+    
+    def _store_cache(self, answer_key: bytes, embedding: Optional[List[float]], intent: str,
+                     answer_text: str, used_history: bool):
+        """Remember a generated answer, failed (empty) answers are not cached"""
+        if answer_text:
+            cached = {"intent": intent, "answer_text": answer_text}
+            self.answer_cache.set(answer_key, cached)
+            # Answers built on a user's history never reach the cache shared by all users
+            if embedding is not None and not used_history:
+                self.semantic_cache.set(embedding, cached)
+    
+    async def _invoke(self, query: str, user_id: str, conversation_id: str,
+                      defer_save: bool, defer_answer: bool,
+                      chat_history: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Run the workflow graph and return its final state"""
         # Initialize state
         initial_state = MedicalWorkflowState(
+            request_id=uuid.uuid4().hex,
             query=query,
             user_id=user_id,
             conversation_id=conversation_id,
+            defer_save=defer_save or defer_answer,
+            defer_answer=defer_answer,
+            chat_history=chat_history,
             intent="",
             structured_query="",
             retriever_results={},
             sufficient=False,
             follow_up_query="",
-            second_retrieval_results={},
             combined_results={},
             answer_text="",
+            used_history=True,
             save_result={}
         )
         
         try:
             # Run the workflow
-            result = await self.workflow.ainvoke(initial_state)
+            result = await self.workflow.ainvoke(
+                initial_state, config={"configurable": {"workflow": self}}
+            )
             logger.info("Medical workflow completed successfully")
             return result
         except Exception as e:
-            logger.error(f"Error in medical workflow: {e}")
+            logger.error("Error in medical workflow: {}", e)
             raise e
+        finally:
+            self._discard_prefetch(initial_state["request_id"])
+    
+    async def run(self, query: str, user_id: str, conversation_id: str,
+                  defer_save: bool = False) -> Dict[str, Any]:
+        """
+        Run the medical workflow with the given inputs
+        
+        Args:
+            query: User's query text
+            user_id: User identifier
+            conversation_id: Conversation identifier
+            defer_save: Stop after the answer and leave saving to the caller (see `save`)
+            
+        Returns:
+            Dict containing the final state of the workflow, with 'coalesced' set when
+            it was produced by an identical request running concurrently (which saves it)
+        """
+        logger.info("Starting medical workflow for query: {}", query)
+        
+        cached, answer_key, embedding, chat_history = await self._lookup_cache(query, user_id, conversation_id)
+        if cached is not None:
+            return await self._cached_result(cached, query, user_id, conversation_id, defer_save)
+        
+        # Identical concurrent submissions (e.g. a double send) share one workflow run; the
+        # conversation is part of the key because answers depend on its history
+        key = self._digest(user_id, conversation_id, normalize_query(query))
+        future = self._inflight.get(key)
+        if future is not None:
+            logger.info("Joining identical in-flight request")
+            try:
+                return {**await asyncio.shield(future), "coalesced": True}
+            except _LeaderCancelled:
+                # The joiner itself was not cancelled, it runs (or joins) the workflow again
+                logger.info("Joined request was cancelled, running the workflow again")
+                return await self.run(query, user_id, conversation_id, defer_save)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._invoke(query, user_id, conversation_id, defer_save, defer_answer=False,
+                                        chat_history=chat_history)
+            self._store_cache(answer_key, embedding, result["intent"], result["answer_text"],
+                              result.get("used_history", True))
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # Cancelling the future would cancel the joined requests too
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case no other request joined
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+    
+    async def run_stream(self, query: str, user_id: str, conversation_id: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Run the medical workflow and stream the answer as the LLM generates it
+        
+        The graph runs up to the answer, which is then streamed from the LLM
+        service. Saving the conversation is left to the caller (see `save`).
+        
+        Args:
+            query: User's query text
+            user_id: User identifier
+            conversation_id: Conversation identifier
+            
+        Yields:
+            Dict events: {'type': 'metadata', 'intent'}, then {'type': 'chunk', 'content'}
+            for every answer chunk and finally {'type': 'complete', 'answer'}
+        """
+        logger.info("Starting streaming medical workflow for query: {}", query)
+        
+        cached, answer_key, embedding, chat_history = await self._lookup_cache(query, user_id, conversation_id)
+        if cached is not None:
+            yield {"type": "metadata", "intent": cached["intent"]}
+            for chunk in _word_chunks(cached["answer_text"]):
+                yield {"type": "chunk", "content": chunk}
+            yield {"type": "complete", "answer": cached["answer_text"]}
+            return
+        
+        state = await self._invoke(query, user_id, conversation_id, defer_save=True, defer_answer=True)
+        intent = state["intent"]
+        yield {"type": "metadata", "intent": intent}
+        
+        if chat_history is None:
+            chat_history = await self.answer_worker.get_conversation_history(user_id, conversation_id)
+        chunks = []
+        async for chunk in self.answer_worker.run_stream(
+            query=query,
+            service_name="general" if intent == "general" else "answer",
+            context=state["combined_results"] if intent == "medical" else None,
+            user_id=user_id,
+            conversation_id=conversation_id,
+            chat_history=chat_history
+        ):
+            chunks.append(chunk)
+            yield {"type": "chunk", "content": chunk}
+        
+        answer_text = "".join(chunks)
+        logger.info("Medical answer streamed")
+        self._store_cache(answer_key, embedding, intent, answer_text, bool(chat_history))
+        yield {"type": "complete", "answer": answer_text}
+    
+    async def run_batch(self, items: List[Dict[str, str]], defer_save: bool = False) -> List[Dict[str, Any]]:
+        """
+        Run the medical workflow for several queries at once
+        
+        The intents of all queries are classified together first, so the
+        per-query classification inside the workflow is served from the cache,
+        then the workflows run concurrently.
+        
+        Args:
+            items: Dicts with 'query', 'user_id' and 'conversation_id' keys
+            defer_save: Stop after the answers and leave saving to the caller (see `save`)
+            
+        Returns:
+            List of final workflow states in the same order as the items
+        """
+        logger.info("Starting medical workflow batch of {} queries", len(items))
+        await self.intent_classifier.run_batch([item["query"] for item in items])
+        return await asyncio.gather(
+            *(self.run(item["query"], item["user_id"], item["conversation_id"], defer_save=defer_save)
+              for item in items)
+        )
+
+    async def save(self, user_id: str, conversation_id: str, query: str, answer: str) -> Dict[str, Any]:
+        """
+        Save a conversation turn produced by a run with defer_save=True
+        
+        Args:
+            user_id: User identifier
+            conversation_id: Conversation identifier
+            query: User's query text
+            answer: Generated answer
+            
+        Returns:
+            Dict containing the save result
+        """
+        result = await self.save_conversation.run(
+            user_id=user_id,
+            conversation_id=conversation_id,
+            query=query,
+            answer=answer
+        )
+        if not result["success"]:
+            logger.error("Deferred save failed for user {}, conversation {}", user_id, conversation_id)
+        return result
+
+    def save_in_background(self, user_id: str, conversation_id: str, query: str, answer: str) -> asyncio.Task:
+        """
+        Save a conversation turn without waiting for it, `close` awaits the pending saves
+        
+        Returns:
+            asyncio.Task: Task of the save
+        """
+        task = asyncio.create_task(self.save(user_id, conversation_id, query, answer))
+        self._pending_saves.add(task)
+        task.add_done_callback(self._on_save_done)
+        return task
+    
+    def _on_save_done(self, task: asyncio.Task):
+        """Forget a finished save and log its failure"""
+        self._pending_saves.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background conversation save failed: {task.exception()}")
+    
+    async def close(self):
+        """Wait for the conversation saves still running"""
+        if self._pending_saves:
+            logger.info("Waiting for {} pending conversation saves", len(self._pending_saves))
+            await asyncio.gather(*self._pending_saves, return_exceptions=True)
+
+    async def warmup(self):
+        """
+        Prime the connections to the tools API and the first-use path of the workers
+        
+        When WARMUP_QUERY is set, that query also runs through the whole workflow.
+        Failures are logged and ignored, the workflow still works cold.
+        """
+        try:
+            async with get_client(self.client) as client:
+                # A health check and a dry classification (embedding + intent search) in parallel
+                # open more than one pooled connection
+                response, _ = await asyncio.gather(
+                    client.get(f"{self.base_url}/health", timeout=5.0),
+                    self.intent_classifier.run("ping")
+                )
+                response.raise_for_status()
+            
+            # Bypasses the answer caches and does not save a conversation
+            if self.warmup_query:
+                await self._invoke(self.warmup_query, "system", "warmup", defer_save=True, defer_answer=False)
+            logger.info("Medical workflow warmed up")
+        except Exception as e:
+            logger.warning(f"Medical workflow warmup failed: {e}")
 
     def health_check(self) -> Dict[str, str]:
         """Health check for medical workflow"""
@@ -313,6 +676,7 @@ async def main():
         except Exception as e:
             logger.error(f"Test case {i} failed: {e}")
     
+    await workflow.close()
     logger.info("Testing completed!")
 
 
@@ -1,6 +1,15 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, Literal
+from fastapi import FastAPI, HTTPException, Request, Response, BackgroundTasks, File, Form, UploadFile
+from fastapi.responses import ORJSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from sse_starlette.sse import EventSourceResponse, ServerSentEvent
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional, Literal, AsyncGenerator
+from contextlib import asynccontextmanager
+import asyncio
+import orjson
+import uuid
+from time import perf_counter
 import uvicorn
 import os
 import sys
@@ -11,17 +20,61 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 # Import workflows directly
 from agent import IndexingWorkflow, MedicalWorkflow
+from workers.http_client import create_client
+from workers.cache import LRUCache
+
+# Write logs from a background thread so sinks never block the event loop
+logger.remove()
+logger.add(sys.stderr, level=os.getenv('LOG_LEVEL', 'INFO'), enqueue=True, backtrace=False, diagnose=False)
+if os.getenv('LOG_FILE'):
+    logger.add(os.getenv('LOG_FILE'), level=os.getenv('LOG_LEVEL', 'INFO'), enqueue=True,
+               rotation="100 MB", compression="gz", backtrace=False, diagnose=False)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the workflows once per process and share one HTTP client across all workers"""
+    logger.info("Initializing workflows...")
+    app.state.http_client = create_client()
+    app.state.indexing = IndexingWorkflow(client=app.state.http_client)
+    app.state.medical = MedicalWorkflow(client=app.state.http_client)
+    app.state.indexing_jobs = LRUCache(int(os.getenv('INDEXING_JOBS_HISTORY', 1000)))
+    logger.info("Workflows initialized")
+    
+    # Warm up connections before serving so the first requests are not slower
+    await asyncio.gather(app.state.indexing.warmup(), app.state.medical.warmup())
+    
+    yield
+    
+    # Pending conversation saves still need the HTTP client
+    await app.state.medical.close()
+    await app.state.http_client.aclose()
+    logger.info("HTTP client closed")
+
+
+class StreamAwareGZipMiddleware(GZipMiddleware):
+    """GZip responses except on streaming paths, whose events must reach the client as they are sent"""
+    
+    def __init__(self, app, skip_paths=(), **kwargs):
+        super().__init__(app, **kwargs)
+        self.skip_paths = frozenset(skip_paths)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Drug Agentic Chatbot API",
     description="API for drug information chatbot with indexing and medical query capabilities",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
-
-# Initialize workflows
-indexing_workflow = IndexingWorkflow()
-medical_workflow = MedicalWorkflow()
+app.add_middleware(StreamAwareGZipMiddleware, minimum_size=1024, skip_paths=("/medical/stream",))
 
 
 # Pydantic models for request/response
@@ -35,14 +88,29 @@ class IndexingResponse(BaseModel):
     document_count: int
     stats: Dict[str, Any]
 
+class IndexingJobResponse(BaseModel):
+    job_id: str
+    status: Literal["pending", "running", "completed", "failed"]
+    message: str = ""
+    result: Optional[IndexingResponse] = None
+
 class MedicalRequest(BaseModel):
     query: str
     user_id: str
-    conversation_id: str
+    conversation_id: str = Field(default_factory=lambda: uuid.uuid4().hex)  # New conversation if omitted
+    id: Optional[str] = None  # Echoed in the response so batch callers can correlate results
 
 class MedicalResponse(BaseModel):
     intent: str
     answer: str
+    conversation_id: str
+    id: Optional[str] = None
+
+class MedicalBatchRequest(BaseModel):
+    items: List[MedicalRequest]
+
+class MedicalBatchResponse(BaseModel):
+    results: List[MedicalResponse]
 
 class HealthResponse(BaseModel):
     status: str
@@ -66,12 +134,12 @@ async def indexing_health_check():
 
 
 @app.post("/indexing/run", response_model=IndexingResponse)
-async def run_indexing(request: IndexingRequest):
+async def run_indexing(request: IndexingRequest, http_request: Request):
     """Run indexing workflow for intent or knowledge data"""
     try:
-        logger.info(f"Starting indexing: {request.index_type} from {request.csv_file_path}")
+        logger.info("Starting indexing: {} from {}", request.index_type, request.csv_file_path)
         
-        result = await indexing_workflow.run(
+        result = await http_request.app.state.indexing.run(
             index_type=request.index_type,
             csv_file_path=request.csv_file_path
         )
@@ -84,13 +152,85 @@ async def run_indexing(request: IndexingRequest):
         )
         
     except Exception as e:
-        logger.error(f"Indexing failed: {e}")
+        logger.exception("Indexing failed")
         raise HTTPException(
             status_code=500, 
             detail=f"Indexing failed: {str(e)}"
         )
 
 
+@app.post("/indexing/upload", response_model=IndexingResponse)
+async def upload_indexing(http_request: Request,
+                          index_type: Literal["intent", "knowledge"] = Form(...),
+                          csv: UploadFile = File(...)):
+    """Run indexing workflow on an uploaded CSV, read from the upload without copying it to a path"""
+    try:
+        logger.info("Starting indexing: {} from upload {}", index_type, csv.filename)
+        
+        result = await http_request.app.state.indexing.run(
+            index_type=index_type,
+            csv_file_path=csv.file
+        )
+        
+        return IndexingResponse(
+            success=result["success"],
+            message=result["message"],
+            document_count=result["document_count"],
+            stats=result["stats"]
+        )
+        
+    except Exception as e:
+        logger.exception("Indexing failed")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Indexing failed: {str(e)}"
+        )
+    finally:
+        await csv.close()
+
+
+async def run_indexing_job(app: FastAPI, job: IndexingJobResponse, request: IndexingRequest):
+    """Run an indexing job submitted through /indexing/submit and record its outcome"""
+    job.status = "running"
+    try:
+        result = await app.state.indexing.run(
+            index_type=request.index_type,
+            csv_file_path=request.csv_file_path
+        )
+        job.result = IndexingResponse(
+            success=result["success"],
+            message=result["message"],
+            document_count=result["document_count"],
+            stats=result["stats"]
+        )
+        job.status = "completed" if result["success"] else "failed"
+        job.message = result["message"]
+    except Exception as e:
+        logger.exception("Indexing job {} failed", job.job_id)
+        job.status = "failed"
+        job.message = str(e)
+
+
+@app.post("/indexing/submit", response_model=IndexingJobResponse, status_code=202)
+async def submit_indexing(request: IndexingRequest, http_request: Request,
+                          background_tasks: BackgroundTasks):
+    """Schedule an indexing run in the background and return a job to poll"""
+    job = IndexingJobResponse(job_id=uuid.uuid4().hex, status="pending", message="scheduled")
+    http_request.app.state.indexing_jobs.set(job.job_id, job)
+    background_tasks.add_task(run_indexing_job, http_request.app, job, request)
+    logger.info("Scheduled indexing job {}: {} from {}", job.job_id, request.index_type, request.csv_file_path)
+    return job
+
+
+@app.get("/indexing/jobs/{job_id}", response_model=IndexingJobResponse)
+async def get_indexing_job(job_id: str, http_request: Request):
+    """Get the status of an indexing job"""
+    job = http_request.app.state.indexing_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown indexing job: {job_id}")
+    return job
+
+
 # Medical endpoints
 @app.get("/medical/health", response_model=HealthResponse)
 async def medical_health_check():
@@ -106,49 +246,156 @@ async def medical_health_check():
         raise HTTPException(status_code=500, detail="Medical service unavailable")
 
 
-@app.post("/medical/run", response_model=MedicalResponse)
-async def run_medical_query(request: MedicalRequest):
+@app.post("/medical/run", responses={200: {"model": MedicalResponse}})
+async def run_medical_query(request: MedicalRequest, http_request: Request,
+                            background_tasks: BackgroundTasks):
     """Run medical workflow to process drug-related queries"""
     try:
-        logger.info(f"Processing medical query for user {request.user_id}: {request.query}")
+        start_time = perf_counter()
+        logger.info("Processing medical query for user {}: {}", request.user_id, request.query)
+        
+        medical_workflow = http_request.app.state.medical
         
         result = await medical_workflow.run(
             query=request.query,
             user_id=request.user_id,
-            conversation_id=request.conversation_id
+            conversation_id=request.conversation_id,
+            defer_save=True
         )
         
-        return MedicalResponse(
-            intent=result["intent"],
-            answer=result["answer_text"]
-        )
+        # Save the conversation after the response has been sent, once per workflow run
+        if not result.get("coalesced"):
+            background_tasks.add_task(
+                medical_workflow.save,
+                user_id=request.user_id,
+                conversation_id=request.conversation_id,
+                query=request.query,
+                answer=result["answer_text"]
+            )
+        
+        logger.info("Medical query processed in {:.3f}s", perf_counter() - start_time)
+        
+        # Built directly, MedicalResponse only documents the schema
+        return ORJSONResponse({
+            "intent": result["intent"],
+            "answer": result["answer_text"],
+            "conversation_id": request.conversation_id,
+            "id": request.id
+        })
         
     except Exception as e:
-        logger.error(f"Medical query failed: {e}")
+        logger.exception("Medical query failed")
         raise HTTPException(
             status_code=500,
             detail=f"Medical query failed: {str(e)}"
         )
 
 
-# Root endpoint
+@app.post("/medical/stream")
+async def stream_medical_query(request: MedicalRequest, http_request: Request):
+    """Run medical workflow and stream the answer as server-sent events"""
+    logger.info("Streaming medical query for user {}: {}", request.user_id, request.query)
+    medical_workflow = http_request.app.state.medical
+    completed = {}
+
+    async def event_stream() -> AsyncGenerator[ServerSentEvent, None]:
+        try:
+            async for event in medical_workflow.run_stream(
+                query=request.query,
+                user_id=request.user_id,
+                conversation_id=request.conversation_id
+            ):
+                if event["type"] == "metadata":
+                    event = {**event, "conversation_id": request.conversation_id}
+                elif event["type"] == "complete":
+                    completed["answer"] = event["answer"]
+                yield ServerSentEvent(data=orjson.dumps(event).decode(), event=event["type"])
+        except Exception as e:
+            logger.exception("Medical stream failed")
+            yield ServerSentEvent(data=orjson.dumps({"type": "error", "message": str(e)}).decode(), event="error")
+
+    # Save the conversation once the whole answer has been sent
+    async def save_answer():
+        if completed.get("answer"):
+            await medical_workflow.save(
+                user_id=request.user_id,
+                conversation_id=request.conversation_id,
+                query=request.query,
+                answer=completed["answer"]
+            )
+
+    return EventSourceResponse(event_stream(), ping=15, background=BackgroundTask(save_answer))
+
+
+@app.post("/medical/batch_run", responses={200: {"model": MedicalBatchResponse}})
+async def run_medical_batch(request: MedicalBatchRequest, http_request: Request,
+                            background_tasks: BackgroundTasks):
+    """Run medical workflow for several queries in one call"""
+    try:
+        start_time = perf_counter()
+        logger.info("Processing medical batch of {} queries", len(request.items))
+        
+        medical_workflow = http_request.app.state.medical
+        results = await medical_workflow.run_batch(
+            [item.model_dump() for item in request.items],
+            defer_save=True
+        )
+        
+        # Save the conversations after the response has been sent, in request order
+        for item, result in zip(request.items, results):
+            if result.get("coalesced"):
+                continue
+            background_tasks.add_task(
+                medical_workflow.save,
+                user_id=item.user_id,
+                conversation_id=item.conversation_id,
+                query=item.query,
+                answer=result["answer_text"]
+            )
+        
+        logger.info("Medical batch processed in {:.3f}s", perf_counter() - start_time)
+        
+        # Built directly, MedicalBatchResponse only documents the schema
+        return ORJSONResponse({"results": [
+            {"intent": result["intent"], "answer": result["answer_text"],
+             "conversation_id": item.conversation_id, "id": item.id}
+            for item, result in zip(request.items, results)
+        ]})
+        
+    except Exception as e:
+        logger.exception("Medical batch failed")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Medical batch failed: {str(e)}"
+        )
+
+
+# Static, so it is serialized once at import time
+_ROOT_PAYLOAD = orjson.dumps({
+    "message": "Drug Agentic Chatbot API",
+    "version": "1.0.0",
+    "endpoints": {
+        "indexing": {
+            "health": "/indexing/health",
+            "run": "/indexing/run",
+            "upload": "/indexing/upload",
+            "submit": "/indexing/submit",
+            "job": "/indexing/jobs/{job_id}"
+        },
+        "medical": {
+            "health": "/medical/health", 
+            "run": "/medical/run",
+            "stream": "/medical/stream",
+            "batch_run": "/medical/batch_run"
+        }
+    }
+})
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
-    return {
-        "message": "Drug Agentic Chatbot API",
-        "version": "1.0.0",
-        "endpoints": {
-            "indexing": {
-                "health": "/indexing/health",
-                "run": "/indexing/run"
-            },
-            "medical": {
-                "health": "/medical/health", 
-                "run": "/medical/run"
-            }
-        }
-    }
+    return Response(_ROOT_PAYLOAD, media_type="application/json")
 
 
 # Main function to run the server
@@ -157,6 +404,8 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
-        log_level="info"
+        # Reloading restarts the process and reloads everything on each code change, development only
+        reload=os.getenv('API_RELOAD', 'false').lower() == 'true',
+        log_level="info",
+        loop="uvloop"
     )
\ No newline at end of file
@@ -1,9 +1,18 @@
 from pymilvus import connections, Collection, CollectionSchema, FieldSchema, DataType, utility
+try:
+    # Native asyncio client, available from pymilvus 2.5
+    from pymilvus import AsyncMilvusClient
+except ImportError:
+    AsyncMilvusClient = None
 from typing import List, Dict, Any, Optional
 import os
+import base64
 from dotenv import load_dotenv
 from loguru import logger
 import asyncio
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 load_dotenv()
 
@@ -14,14 +23,43 @@ class MilvusManager:
         self.db_name = os.getenv('MILVUS_DB', 'drug_chatbot')
         self.vector_dim = int(os.getenv('VECTOR_DIMENSION', 1024))
         self.connection_alias = "default"
+        # Dedicated pool for the blocking pymilvus calls, not shared with other libraries
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('MILVUS_POOL', 32)), thread_name_prefix="milvus"
+        )
+        # Index of the knowledge base (HNSW, IVF_FLAT, IVF_SQ8, IVF_PQ or FLAT), all but FLAT
+        # avoid scanning every vector on each search
+        self.index_type = os.getenv('MILVUS_INDEX_TYPE', 'HNSW').upper()
+        self.hnsw_m = int(os.getenv('HNSW_M', 16))
+        self.hnsw_ef_construction = int(os.getenv('HNSW_EF_CONSTRUCTION', 200))
+        self.hnsw_ef = int(os.getenv('HNSW_EF', 64))
+        # IVF_FLAT, IVF_SQ8 (int8 codes, 4x smaller) and IVF_PQ (product quantization) alternatives,
+        # nlist is best around sqrt(number of rows)
+        self.ivf_nlist = int(os.getenv('IVF_NLIST', 1024))
+        self.ivf_nprobe = int(os.getenv('IVF_NPROBE', 16))
+        self.ivf_pq_m = int(os.getenv('IVF_PQ_M', self.vector_dim // 8))
+        # Searches go through the asyncio client when pymilvus provides it, without a thread hop
+        self.use_async_client = os.getenv('MILVUS_ASYNC_CLIENT', 'true').lower() == 'true'
+        self.async_client = None
+        self.insert_batch_size = int(os.getenv('MILVUS_INSERT_BATCH_SIZE', 10000))
+        # Collection handles and the names already loaded into memory, reused across calls
+        self._collections: Dict[str, Collection] = {}
+        self._loaded: set = set()
+        # Inserted rows are flushed once enough are pending or the oldest has waited long enough,
+        # not on every insert; unflushed rows are still searchable from the growing segments
+        self.flush_rows = int(os.getenv('MILVUS_FLUSH_ROWS', 10000))
+        self.flush_interval = float(os.getenv('MILVUS_FLUSH_INTERVAL', 5))
+        self._pending_rows: Dict[str, int] = {}
+        self._pending_since: Dict[str, float] = {}
+        self._flush_task: Optional[asyncio.Task] = None
     
     async def connect(self):
         """Establish connection to Milvus"""
         try:
             # Run connection in thread pool since pymilvus is sync
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
             await loop.run_in_executor(
-                None,
+                self._executor,
                 lambda: connections.connect(
                     alias=self.connection_alias,
                     host=self.host,
@@ -29,187 +67,324 @@ class MilvusManager:
                 )
             )
             logger.info("Connected to Milvus database")
+            
+            if self.use_async_client and AsyncMilvusClient is not None:
+                self.async_client = AsyncMilvusClient(uri=f"http://{self.host}:{self.port}")
+                logger.info("Using the asyncio Milvus client for searches")
+            elif self.use_async_client:
+                logger.info("AsyncMilvusClient requires pymilvus >= 2.5, searching through the thread pool")
         except Exception as e:
             logger.error(f"Failed to connect to Milvus: {e}")
             raise
+        
+        await self.warmup_collections()
+        self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def warmup_collections(self):
+        """Load the existing searchable collections so the first search does not pay for it"""
+        loop = asyncio.get_running_loop()
+        
+        def _warmup(collection_name: str):
+            if utility.has_collection(collection_name):
+                self._get_collection(collection_name)
+                logger.info(f"Collection {collection_name} loaded")
+        
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self._executor, _warmup, name) for name in self.SEARCH_OUTPUT_FIELDS),
+            return_exceptions=True
+        )
+        for name, result in zip(self.SEARCH_OUTPUT_FIELDS, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to warm up collection {name}: {result}")
+
+    def _get_collection(self, collection_name: str, load: bool = True) -> Collection:
+        """
+        Return the cached handle of a collection, loading it into memory only once
+
+        Blocking, call it from a thread pool in async code.
+
+        Args:
+            collection_name: Name of an existing collection
+            load: Whether the collection must be loaded (required for search)
+
+        Returns:
+            Collection: Collection handle
+        """
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            collection = Collection(collection_name)
+            self._collections[collection_name] = collection
+        if load and collection_name not in self._loaded:
+            collection.load()
+            self._loaded.add(collection_name)
+        return collection
+
+    def _index_params(self, index_type: str) -> Dict[str, Any]:
+        """Build the vector index parameters for an index type"""
+        index_params = {"metric_type": "IP", "index_type": index_type}
+        if index_type == "HNSW":
+            index_params["params"] = {"M": self.hnsw_m, "efConstruction": self.hnsw_ef_construction}
+        elif index_type in ("IVF_FLAT", "IVF_SQ8"):
+            index_params["params"] = {"nlist": self.ivf_nlist}
+        elif index_type == "IVF_PQ":
+            index_params["params"] = {"nlist": self.ivf_nlist, "m": self.ivf_pq_m, "nbits": 8}
+        return index_params
+
+    def _search_params(self, collection_name: str, metric_type: str, top_k: int) -> Dict[str, Any]:
+        """Build the search parameters matching the index of a collection"""
+        search_params = {"metric_type": metric_type}
+        if collection_name != "knowledge_base":
+            return search_params
+        if self.index_type == "HNSW":
+            # ef must be at least the number of requested hits
+            search_params["params"] = {"ef": max(self.hnsw_ef, top_k)}
+        elif self.index_type.startswith("IVF_"):
+            search_params["params"] = {"nprobe": min(self.ivf_nprobe, self.ivf_nlist)}
+        return search_params
+
+    def _forget_collection(self, collection_name: str):
+        """Drop the cached handle of a collection"""
+        self._collections.pop(collection_name, None)
+        self._loaded.discard(collection_name)
+        self._pending_rows.pop(collection_name, None)
+        self._pending_since.pop(collection_name, None)
     
-    async def create_knowledge_base_collection(self) -> Collection | None:
-        """Create knowledge base collection"""
+    async def _create_collection(self, collection_name: str, fields: List[FieldSchema],
+                                 description: str, index_params: Dict[str, Any]) -> Collection | None:
+        """
+        Create a collection with an index on its vector field, or return it if it exists
+
+        Args:
+            collection_name: Name of the collection
+            fields: Field schemas, including the 'vector' field
+            description: Description of the collection schema
+            index_params: Index parameters of the vector field
+
+        Returns:
+            Collection | None: Collection handle, None on failure
+        """
         try:
-            collection_name = "knowledge_base"
-            
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
             
             # Check if collection exists
-            exists = await loop.run_in_executor(None, utility.has_collection, collection_name)
+            exists = await loop.run_in_executor(self._executor, utility.has_collection, collection_name)
             if exists:
                 logger.info(f"Collection {collection_name} already exists")
-                return Collection(collection_name)
-            
-            fields = [
-                FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-                FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=65535),
-                FieldSchema(name="metadata", dtype=DataType.JSON),
-                FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=self.vector_dim)
-            ]
+                return await loop.run_in_executor(
+                    self._executor, lambda: self._get_collection(collection_name, load=False)
+                )
             
-            schema = CollectionSchema(fields, "Knowledge base collection")
+            schema = CollectionSchema(fields, description)
             collection = await loop.run_in_executor(
-                None, lambda: Collection(collection_name, schema)
+                self._executor, lambda: Collection(collection_name, schema)
             )
 
             # Create index for vector field
-            index_params = {
-                "metric_type": "IP",
-                "index_type": "FLAT"
-            }
-            await loop.run_in_executor(None, collection.create_index, "vector", index_params)
+            await loop.run_in_executor(self._executor, collection.create_index, "vector", index_params)
+            self._collections[collection_name] = collection
             
-            logger.info(f"Created collection {collection_name}")
+            logger.info(f"Created collection {collection_name} with {index_params['index_type']} index")
             return collection
         
         except Exception as e:
-            logger.error(f"Failed to create knowledge base collection: {e}")
+            logger.error(f"Failed to create {collection_name} collection: {e}")
             return None
 
+    async def create_knowledge_base_collection(self) -> Collection | None:
+        """Create knowledge base collection"""
+        fields = [
+            FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
+            FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=65535),
+            FieldSchema(name="metadata", dtype=DataType.JSON),
+            FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=self.vector_dim)
+        ]
+        return await self._create_collection(
+            "knowledge_base", fields, "Knowledge base collection", self._index_params(self.index_type)
+        )
+
     async def create_intent_queries_collection(self) -> Collection | None:
         """Create intent queries collection"""
-        try:
-            collection_name = "intent_queries"
-            loop = asyncio.get_event_loop()
-            
-            # Check if collection exists
-            exists = await loop.run_in_executor(None, utility.has_collection, collection_name)
-            if exists:
-                logger.info(f"Collection {collection_name} already exists")
-                return Collection(collection_name)
-            
-            fields = [
-                FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-                FieldSchema(name="query", dtype=DataType.VARCHAR, max_length=65535),
-                FieldSchema(name="intent_label", dtype=DataType.VARCHAR, max_length=100),
-                FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=self.vector_dim)
-            ]
-            
-            schema = CollectionSchema(fields, "Intent queries collection")
-            collection = await loop.run_in_executor(
-                None,
-                lambda: Collection(collection_name, schema)
-            )
-            
-            # Create index for vector field
-            index_params = {
-                "metric_type": "IP",
-                "index_type": "FLAT"
-            }
-            await loop.run_in_executor(None, collection.create_index, "vector", index_params)
-            
-            logger.info(f"Created collection {collection_name}")
-            return collection
-        
-        except Exception as e:
-            logger.error(f"Failed to create intent queries collection: {e}")
-            return None
+        fields = [
+            FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
+            FieldSchema(name="query", dtype=DataType.VARCHAR, max_length=65535),
+            FieldSchema(name="intent_label", dtype=DataType.VARCHAR, max_length=100),
+            FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=self.vector_dim)
+        ]
+        # Small collection, an exact scan is cheap
+        return await self._create_collection(
+            "intent_queries", fields, "Intent queries collection", self._index_params("FLAT")
+        )
     
     async def insert_documents(self, collection_name: str, documents: List[Dict[str, Any]]):
         """Insert documents into collection"""
         try:
             # Prepare data for insertion
+            collection = self._collections.get(collection_name)
             if collection_name == "knowledge_base":
-                collection = await self.create_knowledge_base_collection()
+                if collection is None:
+                    collection = await self.create_knowledge_base_collection()
                 data = [
                     [doc.get('content', '') for doc in documents],      # content field
                     [doc.get('metadata', {}) for doc in documents],     # metadata field  
-                    [doc.get('vector', []) for doc in documents]        # vector field
+                    self._vector_column(documents)                      # vector field
                 ]
             elif collection_name == "intent_queries":
-                collection = await self.create_intent_queries_collection()
+                if collection is None:
+                    collection = await self.create_intent_queries_collection()
                 data = [
                     [doc.get('query', '') for doc in documents],        # query field
                     [doc.get('intent_label', '') for doc in documents], # intent_label field
-                    [doc.get('vector', []) for doc in documents]        # vector field
+                    self._vector_column(documents)                      # vector field
                 ]
             else:
                 raise ValueError(f"Unknown collection: {collection_name}")
             
-            # Insert data in thread pool
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, collection.insert, data)
-            await loop.run_in_executor(None, collection.flush)
+            # Insert data in thread pool, in chunks to bound the request size
+            loop = asyncio.get_running_loop()
+            for start in range(0, len(documents), self.insert_batch_size):
+                chunk = [column[start:start + self.insert_batch_size] for column in data]
+                await loop.run_in_executor(self._executor, collection.insert, chunk)
             
             logger.info(f"Inserted {len(documents)} documents into {collection_name}")
+            
+            # Flush by size here, by age from the periodic task
+            self._pending_rows[collection_name] = self._pending_rows.get(collection_name, 0) + len(documents)
+            self._pending_since.setdefault(collection_name, time.monotonic())
+            if self._pending_rows[collection_name] >= self.flush_rows:
+                await self.flush(collection_name)
         except Exception as e:
             logger.error(f"Failed to insert documents: {e}")
             raise
     
+    async def flush(self, collection_name: Optional[str] = None):
+        """
+        Flush the rows inserted since the last flush into sealed segments
+        
+        Args:
+            collection_name: Collection to flush, every collection with pending rows if None
+        """
+        names = [collection_name] if collection_name else list(self._pending_rows)
+        loop = asyncio.get_running_loop()
+        for name in names:
+            rows = self._pending_rows.pop(name, 0)
+            self._pending_since.pop(name, None)
+            collection = self._collections.get(name)
+            if not rows or collection is None:
+                continue
+            try:
+                await loop.run_in_executor(self._executor, collection.flush)
+                logger.info(f"Flushed {rows} rows of {name}")
+            except Exception as e:
+                logger.error(f"Failed to flush {name}: {e}")
+    
+    async def _flush_periodically(self):
+        """Flush the collections whose oldest pending row waited longer than the flush interval"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            now = time.monotonic()
+            for name, since in list(self._pending_since.items()):
+                if now - since >= self.flush_interval:
+                    await self.flush(name)
+    
+    @staticmethod
+    def _vector_column(documents: List[Dict[str, Any]]) -> np.ndarray:
+        """Stack the document vectors into one (N, dim) float32 array"""
+        # Vectors packed by the embedding service (base64 float16 strings) are decoded here
+        return np.asarray([
+            np.frombuffer(base64.b64decode(vector), dtype=np.float16) if isinstance(vector, str) else vector
+            for vector in (doc.get('vector', []) for doc in documents)
+        ], dtype=np.float32)
+    
+    # Fields returned with the hits of each searchable collection
+    SEARCH_OUTPUT_FIELDS = {
+        "knowledge_base": ["content", "metadata"],
+        "intent_queries": ["intent_label"],
+    }
+
     async def search_vector(self, query_vector: List[float], collection_name: str,
                             top_k: int = 10, metric_type: str = "IP") -> List[Dict]:
         """Search for similar vectors"""
+        results = await self.search_vectors_batch([query_vector], collection_name, top_k, metric_type)
+        return results[0]
+
+    async def search_vectors_batch(self, query_vectors: List[List[float]], collection_name: str,
+                                   top_k: int = 10, metric_type: str = "IP") -> List[List[Dict]]:
+        """
+        Search for similar vectors of several queries with a single request
+
+        Args:
+            query_vectors: Query embeddings
+            collection_name: 'knowledge_base' or 'intent_queries'
+            top_k: Number of hits per query
+            metric_type: Similarity metric of the index
+
+        Returns:
+            List[List[Dict]]: Hits of each query, in the same order as query_vectors
+        """
+        output_fields = self.SEARCH_OUTPUT_FIELDS.get(collection_name)
+        if output_fields is None:
+            logger.warning(f"Unknown collection: {collection_name}")
+            return [[] for _ in query_vectors]
+
         try:
-            collection = Collection(collection_name)
-            search_params = {"metric_type": metric_type}
-            loop = asyncio.get_event_loop()
+            search_params = self._search_params(collection_name, metric_type, top_k)
+            loop = asyncio.get_running_loop()
+            # Only a collection not loaded yet needs the blocking construction and load
+            collection = self._collections.get(collection_name) if collection_name in self._loaded else None
+            if collection is None:
+                collection = await loop.run_in_executor(self._executor, self._get_collection, collection_name)
 
-            # Search in knowledge base collection
-            if collection_name == "knowledge_base":            
-                await loop.run_in_executor(None, collection.load)
-                
-                # Search in thread pool
-                results = await loop.run_in_executor(
-                    None,
-                    lambda: collection.search(
-                        data=[query_vector],
-                        anns_field="vector",
-                        param=search_params,
-                        limit=top_k,
-                        output_fields=["content", "metadata"]
-                    )
+            if self.async_client is not None:
+                results = await self.async_client.search(
+                    collection_name=collection_name,
+                    data=query_vectors,
+                    anns_field="vector",
+                    search_params=search_params,
+                    limit=top_k,
+                    output_fields=output_fields
                 )
-                
-                # Format results
-                formatted_results = []
-                for hit in results[0]:
-                    formatted_results.append({
-                        "content": hit.entity.get("content"),
-                        "metadata": hit.entity.get("metadata"),
-                        "score": hit.score
-                    })
-                return formatted_results
-            
-            elif collection_name == "intent_queries":
-                await loop.run_in_executor(None, collection.load)
-                
-                # Search in thread pool
-                results = await loop.run_in_executor(
-                    None,
-                    lambda: collection.search(
-                        data=[query_vector],
-                        anns_field="vector",
-                        param=search_params,
-                        limit=top_k,
-                        output_fields=["intent_label"]
-                    )
+                return [
+                    [
+                        {**{field: hit["entity"].get(field) for field in output_fields}, "score": hit["distance"]}
+                        for hit in hits
+                    ]
+                    for hits in results
+                ]
+
+            # Search in thread pool, Milvus scans the index once for all query vectors
+            results = await loop.run_in_executor(
+                self._executor,
+                lambda: collection.search(
+                    data=query_vectors,
+                    anns_field="vector",
+                    param=search_params,
+                    limit=top_k,
+                    output_fields=output_fields
                 )
-                
-                # Format results
-                formatted_results = []
-                for hit in results[0]:
-                    formatted_results.append({
-                        "intent_label": hit.entity.get("intent_label"),
-                        "score": hit.score
-                    })
-                return formatted_results
-            
-            else:
-                logger.warning(f"Unknown collection: {collection_name}")
-                return []
+            )
+
+            # Format results
+            return [
+                [
+                    {**{field: hit.entity.get(field) for field in output_fields}, "score": hit.score}
+                    for hit in hits
+                ]
+                for hits in results
+            ]
 
         except Exception as e:
             logger.error(f"Failed to search vectors: {e}")
-            return []
+            return [[] for _ in query_vectors]
 
-    def get_collection_stats(self) -> Dict[str, int]:
+    async def get_collection_stats(self) -> Dict[str, int]:
         """Get statistics for all collections"""
+        # num_entities only counts flushed rows
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._get_collection_stats)
+
+    def _get_collection_stats(self) -> Dict[str, int]:
+        """Get statistics for all collections (blocking)"""
         try:
             # List all collections
             collection_names = utility.list_collections()
@@ -217,9 +392,8 @@ class MilvusManager:
             
             for collection_name in collection_names:
                 try:
-                    collection = Collection(collection_name)
-                    # Load collection to get accurate count
-                    collection.load()
+                    # Load collection (once) to get accurate count
+                    collection = self._get_collection(collection_name)
                     # Get number of entities (documents)
                     stats[collection_name] = collection.num_entities
                 except Exception as e:
@@ -232,13 +406,19 @@ class MilvusManager:
             logger.error(f"Failed to get collection stats: {e}")
             return {}
 
-    def delete_collection(self, collection_name: str) -> Dict[str, str]:
+    async def delete_collection(self, collection_name: str) -> Dict[str, str]:
         """Delete a collection if it exists"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._delete_collection, collection_name)
+
+    def _delete_collection(self, collection_name: str) -> Dict[str, str]:
+        """Delete a collection if it exists (blocking)"""
         try:
             # Check if collection exists
             if utility.has_collection(collection_name):
                 # Drop the collection
                 utility.drop_collection(collection_name)
+                self._forget_collection(collection_name)
                 logger.info(f"Successfully deleted collection: {collection_name}")
                 return {"status": "success", "message": f"Collection '{collection_name}' deleted successfully"}
             else:
@@ -252,8 +432,16 @@ class MilvusManager:
     async def close(self):
         """Close connection to Milvus"""
         try:
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, connections.disconnect, self.connection_alias)
+            if self._flush_task is not None:
+                self._flush_task.cancel()
+                self._flush_task = None
+            await self.flush()
+            loop = asyncio.get_running_loop()
+            if self.async_client is not None:
+                await self.async_client.close()
+                self.async_client = None
+            await loop.run_in_executor(self._executor, connections.disconnect, self.connection_alias)
+            self._executor.shutdown(wait=False)
             logger.info("Milvus connection closed")
         except Exception as e:
             logger.error(f"Error closing Milvus connection: {e}")
@@ -1,9 +1,9 @@
 import asyncpg
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import os
 from dotenv import load_dotenv
 from loguru import logger
-from asyncpg.connection import Connection
+from asyncpg.pool import Pool
 
 load_dotenv()
 
@@ -14,19 +14,29 @@ class PostgresManager:
         self.database = os.getenv('POSTGRES_DB', 'drug_chatbot')
         self.user = os.getenv('POSTGRES_USER', 'postgres')
         self.password = os.getenv('POSTGRES_PASSWORD', 'password')
-        self.connection: Optional[Connection] = None
+        self.pool_min_size = int(os.getenv('PG_POOL_MIN', 5))
+        self.pool_max_size = int(os.getenv('PG_POOL_MAX', 20))
+        # asyncpg prepares each distinct query once per connection and reuses the statement,
+        # the fixed query texts below are parsed and planned once per pooled connection
+        self.statement_cache_size = int(os.getenv('PG_STATEMENT_CACHE_SIZE', 100))
+        # Each query borrows a pooled connection, concurrent queries no longer share one session
+        self.pool: Optional[Pool] = None
 
     async def connect(self):
-        """Establish database connection"""
+        """Create the database connection pool"""
         try:
-            self.connection = await asyncpg.connect(
+            self.pool = await asyncpg.create_pool(
                 host=self.host,
                 port=self.port,
                 database=self.database,
                 user=self.user,
-                password=self.password
+                password=self.password,
+                min_size=self.pool_min_size,
+                max_size=self.pool_max_size,
+                max_inactive_connection_lifetime=300,
+                statement_cache_size=self.statement_cache_size
             )
-            logger.info("Connected to PostgreSQL database")
+            logger.info(f"Connected to PostgreSQL database (pool of {self.pool_min_size}-{self.pool_max_size} connections)")
         except Exception as e:
             logger.error(f"Failed to connect to PostgreSQL: {e}")
             raise
@@ -45,8 +55,10 @@ class PostgresManager:
                 PRIMARY KEY (user_id, conversation_id, turn)
             );
             
-            CREATE INDEX IF NOT EXISTS idx_user_conversation 
-            ON conversations (user_id, conversation_id);
+            -- The primary key index already serves lookups by conversation, including the
+            -- latest turns (scanned backwards), a separate (user_id, conversation_id) index
+            -- only slows down inserts
+            DROP INDEX IF EXISTS idx_user_conversation;
             """
         elif table_name == "personal_information":
             command = """
@@ -62,26 +74,109 @@ class PostgresManager:
             raise ValueError(f"Unknown table name: {table_name}")
 
         try:
-            await self.connection.execute(command)
+            await self.pool.execute(command)
             logger.info("Tables created successfully")
         except Exception as e:
             logger.error(f"Failed to create tables: {e}")
             raise
     
-    async def save_conversation(self, user_id: str, conversation_id: str, turn: int, query: str, answer: str):
-        """Save conversation to database"""
+    async def save_conversation(self, user_id: str, conversation_id: str, query: str, answer: str) -> int:
+        """
+        Save conversation to database, assigning the next turn number in the same statement
+
+        Returns:
+            int: Turn number assigned to the saved row
+        """
         insert_query = """
         INSERT INTO conversations (user_id, conversation_id, turn, query, answer)
-        VALUES ($1, $2, $3, $4, $5)
+        SELECT $1, $2, COALESCE(MAX(turn), 0) + 1, $3, $4
+        FROM conversations
+        WHERE user_id = $1 AND conversation_id = $2
+        RETURNING turn
         """
         
         try:
-            await self.connection.execute(insert_query, user_id, conversation_id, turn, query, answer)
+            turn = await self.pool.fetchval(insert_query, user_id, conversation_id, query, answer)
             logger.info(f"Conversation saved for user {user_id}, conversation {conversation_id}, turn {turn}")
+            return int(turn)
         except Exception as e:
             logger.error(f"Failed to save conversation: {e}")
             raise
     
+    async def save_conversations(self, rows: List[Tuple[str, str, str, str]]) -> List[int]:
+        """
+        Save several conversation turns with a single INSERT
+
+        Turn numbers are assigned in the same statement: the current maximum turn of
+        each conversation plus the position of the row within its conversation.
+
+        Args:
+            rows: List of (user_id, conversation_id, query, answer) in arrival order
+
+        Returns:
+            List[int]: Turn number assigned to each row, in the same order
+        """
+        insert_query = """
+        WITH new_rows AS (
+            SELECT *
+            FROM unnest($1::varchar[], $2::varchar[], $3::text[], $4::text[])
+                WITH ORDINALITY AS t(user_id, conversation_id, query, answer, ord)
+        ),
+        numbered AS (
+            SELECT n.ord, n.user_id, n.conversation_id, n.query, n.answer,
+                   COALESCE((
+                       SELECT MAX(c.turn) FROM conversations c
+                       WHERE c.user_id = n.user_id AND c.conversation_id = n.conversation_id
+                   ), 0) + ROW_NUMBER() OVER (
+                       PARTITION BY n.user_id, n.conversation_id ORDER BY n.ord
+                   ) AS turn
+            FROM new_rows n
+        ),
+        inserted AS (
+            INSERT INTO conversations (user_id, conversation_id, turn, query, answer)
+            SELECT user_id, conversation_id, turn, query, answer FROM numbered
+        )
+        SELECT turn FROM numbered ORDER BY ord;
+        """
+
+        try:
+            user_ids, conversation_ids, queries, answers = (list(column) for column in zip(*rows))
+            result = await self.pool.fetch(insert_query, user_ids, conversation_ids, queries, answers)
+            logger.info(f"Saved {len(rows)} conversation turns")
+            return [int(row['turn']) for row in result]
+        except Exception as e:
+            logger.error(f"Failed to save conversations: {e}")
+            raise
+
+    async def save_conversations_bulk(self, records: List[Tuple[str, str, int, str, str]],
+                                      chunk_size: int = 10000) -> int:
+        """
+        Bulk load conversation turns with COPY, for backfills and evaluation sets
+
+        Turn numbers are taken as given, the whole load runs in one transaction.
+
+        Args:
+            records: List of (user_id, conversation_id, turn, query, answer)
+            chunk_size: Number of rows sent per COPY
+
+        Returns:
+            int: Number of rows written
+        """
+        try:
+            async with self.pool.acquire() as connection:
+                async with connection.transaction():
+                    for start in range(0, len(records), chunk_size):
+                        await connection.copy_records_to_table(
+                            'conversations',
+                            records=records[start:start + chunk_size],
+                            columns=('user_id', 'conversation_id', 'turn', 'query', 'answer')
+                        )
+            logger.info(f"Bulk loaded {len(records)} conversation turns")
+            return len(records)
+        except Exception as e:
+            logger.error(f"Failed to bulk load conversations: {e}")
+            raise
+
     async def get_next_turn(self, user_id: str, conversation_id: str) -> int:
         """Get the next turn number for a conversation"""
         select_query = """
@@ -91,7 +186,7 @@ class PostgresManager:
         """
         
         try:
-            row = await self.connection.fetchrow(select_query, user_id, conversation_id)
+            row = await self.pool.fetchrow(select_query, user_id, conversation_id)
             return int(row['next_turn'])
         except Exception as e:
             logger.error(f"Failed to get next turn: {e}")
@@ -100,26 +195,25 @@ class PostgresManager:
     async def get_conversation_history(self, user_id: str, conversation_id: str, limit: int) -> List[Dict]:
         """Get conversation history for a user"""
         select_query = """
-        SELECT * FROM (
-            SELECT turn, query, answer
-            FROM conversations
-            WHERE user_id = $1 AND conversation_id = $2
-            ORDER BY turn DESC
-            LIMIT $3
-        ) sub
-        ORDER BY turn ASC;
+        SELECT turn, query, answer
+        FROM conversations
+        WHERE user_id = $1 AND conversation_id = $2
+        ORDER BY turn DESC
+        LIMIT $3
         """
         
         try:
-            rows = await self.connection.fetch(select_query, user_id, conversation_id, limit)
-            return [dict(row) for row in rows]
+            # Latest turns first straight from the primary key index, returned oldest first
+            rows = await self.pool.fetch(select_query, user_id, conversation_id, limit)
+            return [dict(row) for row in reversed(rows)]
         except Exception as e:
             logger.error(f"Failed to get conversation history: {e}")
             return []
     
     async def close(self):
-        """Close database connection"""
-        if self.connection:
-            await self.connection.close()
-            logger.info("PostgreSQL connection closed")
+        """Close the database connection pool"""
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+            logger.info("PostgreSQL connection pool closed")
 
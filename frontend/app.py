@@ -1,8 +1,9 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
-import os
+from collections import deque
 
 # Configure Streamlit page
 st.set_page_config(
@@ -14,9 +15,18 @@ st.set_page_config(
 # API base URL
 API_BASE_URL = "http://localhost:8000"
 
+# Chat turns kept in the session, older ones are dropped; the model context is
+# read server side and already bounded by LIMIT_CONVERSATIONS
+MAX_CHAT_HISTORY = 100
+
 # Initialize session state for chat history
 if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+    st.session_state.chat_history = deque(maxlen=MAX_CHAT_HISTORY)
+
+# Keep-alive HTTP session reused across reruns for the indexing and chat calls
+if "http" not in st.session_state:
+    st.session_state.http = requests.Session()
+    st.session_state.http.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=32))
 
 # Sidebar for indexing controls
 st.sidebar.title("Indexing Controls")
@@ -42,23 +52,14 @@ uploaded_file = st.sidebar.file_uploader(
 # Run Indexing button
 if st.sidebar.button("Run Indexing", type="primary"):
     if uploaded_file is not None:
-        # Save uploaded file temporarily
-        temp_file_path = f"/tmp/{uploaded_file.name}"
-        with open(temp_file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        
-        # Prepare indexing request
-        indexing_data = {
-            "index_type": index_type,
-            "csv_file_path": temp_file_path
-        }
-        
         with st.sidebar:
             with st.spinner("Running indexing..."):
                 try:
-                    response = requests.post(
-                        f"{API_BASE_URL}/indexing/run",
-                        json=indexing_data,
+                    # Send the uploaded buffer itself as multipart, no temporary file on either side
+                    response = st.session_state.http.post(
+                        f"{API_BASE_URL}/indexing/upload",
+                        data={"index_type": index_type},
+                        files={"csv": (uploaded_file.name, uploaded_file, "text/csv")},
                         timeout=300
                     )
                     
@@ -73,10 +74,6 @@ if st.sidebar.button("Run Indexing", type="primary"):
                     st.error(f"❌ Connection error: {str(e)}")
                 except Exception as e:
                     st.error(f"❌ Error: {str(e)}")
-                finally:
-                    # Clean up temp file
-                    if os.path.exists(temp_file_path):
-                        os.remove(temp_file_path)
     else:
         st.sidebar.error("Please upload a CSV file first!")
 
@@ -117,31 +114,51 @@ if query:
         }
         
         try:
-            # Make API call
-            response = requests.post(
-                f"{API_BASE_URL}/medical/run",
+            # Stream the answer as server-sent events, rendering each chunk as it arrives
+            with st.session_state.http.post(
+                f"{API_BASE_URL}/medical/stream",
                 json=medical_data,
-                timeout=360
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                answer = result["answer"]
-                intent = result["intent"]
-                
-                # Clear thinking indicator and show response
-                thinking_placeholder.empty()
-                st.write(f"**Intent:** {intent}")
-                st.write(answer)
-                
-                # Add assistant response to chat history
-                st.session_state.chat_history.append(("assistant", f"**Intent:** {intent}\n\n{answer}"))
-                
-            else:
-                thinking_placeholder.empty()
-                error_message = f"❌ API Error: {response.text}"
-                st.error(error_message)
-                st.session_state.chat_history.append(("assistant", error_message))
+                timeout=360,
+                stream=True
+            ) as response:
+                if response.status_code == 200:
+                    intent = ""
+                    answer = ""
+                    intent_placeholder = st.empty()
+                    answer_placeholder = st.empty()
+                    
+                    for line in response.iter_lines():
+                        # Skip the event names, keep-alive pings and separators
+                        line = line.decode("utf-8")
+                        if not line.startswith("data:"):
+                            continue
+                        event = json.loads(line[5:].strip())
+                        
+                        if event["type"] == "metadata":
+                            intent = event["intent"]
+                            thinking_placeholder.empty()
+                            intent_placeholder.write(f"**Intent:** {intent}")
+                        elif event["type"] == "chunk":
+                            answer += event["content"]
+                            answer_placeholder.markdown(answer + "▌")
+                        elif event["type"] == "complete":
+                            answer = event["answer"]
+                            break
+                        elif event["type"] == "error":
+                            raise RuntimeError(event["message"])
+                    
+                    # Show the final response without the cursor
+                    thinking_placeholder.empty()
+                    answer_placeholder.markdown(answer)
+                    
+                    # Add assistant response to chat history
+                    st.session_state.chat_history.append(("assistant", f"**Intent:** {intent}\n\n{answer}"))
+                    
+                else:
+                    thinking_placeholder.empty()
+                    error_message = f"❌ API Error: {response.text}"
+                    st.error(error_message)
+                    st.session_state.chat_history.append(("assistant", error_message))
                 
         except requests.exceptions.RequestException as e:
             thinking_placeholder.empty()
@@ -27,13 +27,17 @@ def main():
     print("📡 Streaming Q&A: http://localhost:8000/qa/stream")
     print("📊 Indexing endpoint: http://localhost:8000/index")
     
+    # Reloading restarts the process on each code change, development only;
+    # uvicorn needs the import string instead of the app object to reload
+    reload = os.getenv('API_RELOAD', 'false').lower() == 'true'
     uvicorn.run(
-        app,
+        "api.main:app" if reload else app,
         host="0.0.0.0",
         port=8000,
         log_level="info",
         access_log=True,
-        reload=True  # Set to False in production
+        reload=reload,
+        loop="uvloop"
     )
 
 if __name__ == "__main__":
@@ -4,22 +4,28 @@ Test script for Drug Agentic Chatbot API
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 # Add project root to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 API_BASE_URL = "http://localhost:8000"
 
+# One keep-alive session for all tests instead of a new connection per request
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=32))
+
 def test_health_check():
     """Test health check endpoint"""
     print("🔍 Testing health check...")
     
     try:
-        response = requests.get(f"{API_BASE_URL}/health")
+        response = SESSION.get(f"{API_BASE_URL}/health")
         result = response.json()
         
         if response.status_code == 200:
@@ -41,7 +47,7 @@ def test_indexing():
             "csv_file_path": "data/knowledge_base.csv"
         }
         
-        response = requests.post(f"{API_BASE_URL}/index", json=payload)
+        response = SESSION.post(f"{API_BASE_URL}/index", json=payload)
         result = response.json()
         
         if response.status_code == 200 and result['success']:
@@ -66,7 +72,7 @@ def test_qa():
             "conversation_id": "test_conv_456"
         }
         
-        response = requests.post(f"{API_BASE_URL}/qa", json=payload)
+        response = SESSION.post(f"{API_BASE_URL}/qa", json=payload)
         result = response.json()
         
         if response.status_code == 200 and result['success']:
@@ -92,7 +98,7 @@ def test_streaming_qa():
             "conversation_id": "test_conv_streaming"
         }
         
-        response = requests.post(
+        response = SESSION.post(
             f"{API_BASE_URL}/qa/stream", 
             json=payload,
             stream=True
@@ -128,7 +134,7 @@ def test_status():
     print("\n📊 Testing status...")
     
     try:
-        response = requests.get(f"{API_BASE_URL}/status")
+        response = SESSION.get(f"{API_BASE_URL}/status")
         result = response.json()
         
         if response.status_code == 200:
@@ -152,26 +158,26 @@ def main():
     print("⏳ Waiting for API to be ready...")
     time.sleep(2)
     
-    tests = [
-        ("Health Check", test_health_check),
-        ("Status Check", test_status),
-        ("Indexing", test_indexing),
-        ("Q&A", test_qa),
-        ("Streaming Q&A", test_streaming_qa)
+    # The tests of a phase run concurrently over the pooled session;
+    # indexing runs alone since the Q&A tests need the indexed data
+    phases = [
+        [("Health Check", test_health_check), ("Status Check", test_status)],
+        [("Indexing", test_indexing)],
+        [("Q&A", test_qa), ("Streaming Q&A", test_streaming_qa)]
     ]
     
     results = []
     
-    for test_name, test_func in tests:
-        print(f"\n{'='*20} {test_name} {'='*20}")
-        try:
-            result = test_func()
-            results.append((test_name, result))
-        except Exception as e:
-            print(f"❌ {test_name} failed with exception: {e}")
-            results.append((test_name, False))
-        
-        time.sleep(1)  # Small delay between tests
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for phase in phases:
+            print(f"\n{'='*20} {' | '.join(test_name for test_name, _ in phase)} {'='*20}")
+            futures = [(test_name, executor.submit(test_func)) for test_name, test_func in phase]
+            for test_name, future in futures:
+                try:
+                    results.append((test_name, future.result()))
+                except Exception as e:
+                    print(f"❌ {test_name} failed with exception: {e}")
+                    results.append((test_name, False))
     
     # Summary
     print(f"\n{'='*50}")
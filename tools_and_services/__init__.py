@@ -1,8 +1,26 @@
-from .embedding import EmbeddingTool
-from .rerank import RerankTool
-from .vector_db import VectorDBTool
-from .web_search import WebSearchTool
-from .metadata_db import MetadataDBTool
-from .llm_services import LLMService
+import importlib
+
+# Tools are imported on first access (PEP 562), so importing one submodule such as
+# tools_and_services.embedding.embedding_cache does not load every model library
+_TOOL_MODULES = {
+    'EmbeddingTool': '.embedding',
+    'RerankTool': '.rerank',
+    'VectorDBTool': '.vector_db',
+    'WebSearchTool': '.web_search',
+    'MetadataDBTool': '.metadata_db',
+    'LLMService': '.llm_services',
+}
 
 __all__ = ['EmbeddingTool', 'RerankTool', 'VectorDBTool', 'WebSearchTool', 'MetadataDBTool', 'LLMService']
+
+
+def __getattr__(name):
+    if name not in _TOOL_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_TOOL_MODULES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
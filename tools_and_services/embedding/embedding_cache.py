@@ -0,0 +1,120 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Union
+
+import numpy as np
+from loguru import logger
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache, an in-process LRU in front of SQLite, keyed by a hash of the model name and the text"""
+
+    # Vectors are stored as float16, half the size of float32 for a negligible loss on
+    # normalized embeddings; the table name carries the dtype so older rows are never misread
+    TABLE = "embeddings_f16"
+    DTYPE = np.float16
+
+    def __init__(self, path: str, model_name: str, memory_size: int = 10000,
+                 backend: str = "torch", model_file: str = "", dtype: str = ""):
+        """
+        Initialize EmbeddingCache
+
+        Args:
+            path: SQLite database file, created if it does not exist
+            model_name: Embedding model, part of the key so a model swap never returns stale vectors
+            memory_size: Embeddings kept decoded in memory, the least recently used is evicted first
+            backend: Inference backend, part of the key like the model
+            model_file: Exported model file (e.g. an int8 quantized one), part of the key like the model
+            dtype: Weight dtype, part of the key like the model
+        """
+        self.path = path
+        self.model_name = model_name
+        # Everything that changes the vectors produced for a text
+        self._key_prefix = f"{model_name}\0{backend}\0{model_file}\0{dtype}\0"
+        self.memory_size = memory_size
+        self._memory: OrderedDict = OrderedDict()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Used from the thread pool, the lock serializes access to the shared connection
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.TABLE} (key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._connection.commit()
+
+    def _key(self, text: str) -> bytes:
+        """Hash the model configuration and a text into the row key"""
+        return hashlib.sha256(f"{self._key_prefix}{text}".encode()).digest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up the embeddings of several texts
+
+        Returns:
+            List[Optional[np.ndarray]]: float32 embedding of each text, None on a miss
+        """
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            results = [self._memory.get(key) for key in keys]
+            for key, embedding in zip(keys, results):
+                if embedding is not None:
+                    self._memory.move_to_end(key)
+            missing = list({key for key, embedding in zip(keys, results) if embedding is None})
+            found = {}
+            # Stay below SQLite's limit on bound parameters
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = self._connection.execute(
+                    f"SELECT key, vector FROM {self.TABLE} WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                found.update(
+                    (key, np.frombuffer(vector, dtype=self.DTYPE).astype(np.float32))
+                    for key, vector in rows
+                )
+            self._remember(found)
+        return [found.get(key) if embedding is None else embedding for key, embedding in zip(keys, results)]
+
+    def _remember(self, embeddings: dict):
+        """Add decoded embeddings to the memory tier, the lock must be held"""
+        if self.memory_size <= 0:
+            return
+        for key, embedding in embeddings.items():
+            self._memory[key] = embedding
+            self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def set_many(self, texts: List[str], embeddings: Union[np.ndarray, List[List[float]]]):
+        """Store the embeddings of several texts, empty (failed) embeddings are skipped"""
+        if isinstance(embeddings, np.ndarray):
+            # Convert the whole batch at once
+            embeddings = embeddings.astype(self.DTYPE)
+        rows = [
+            (self._key(text), np.asarray(embedding, dtype=self.DTYPE).tobytes())
+            for text, embedding in zip(texts, embeddings) if len(embedding)
+        ]
+        if not rows:
+            return
+        with self._lock:
+            # The memory tier holds what the disk returns, the float16 rounded vectors
+            self._remember({
+                key: np.frombuffer(vector, dtype=self.DTYPE).astype(np.float32)
+                for key, vector in rows
+            })
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO {self.TABLE} (key, vector) VALUES (?, ?)", rows
+            )
+            self._connection.commit()
+
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            self._memory.clear()
+            self._connection.close()
+        logger.info("Embedding cache closed")
@@ -1,4 +1,5 @@
 from sentence_transformers import SentenceTransformer
+import base64
 import numpy as np
 from typing import List, Dict, Dict
 import os
@@ -7,7 +8,9 @@ from loguru import logger
 import asyncio
 from time import time
 import torch
-import gc
+
+from tools_and_services.embedding.embedding_cache import EmbeddingCache
+from utils.batcher import AsyncBatcher
 
 load_dotenv()
 
@@ -16,55 +19,198 @@ class EmbeddingTool:
         self.model_name = os.getenv('EMBEDDING_MODEL', 'Qwen/Qwen3-Embedding-0.6B')
         self.model = None
         self.cache_dir = os.path.join(os.path.dirname(__file__), 'cache')
-        self.batch_size = 8
+        self.batch_size = int(os.getenv('EMBEDDING_MODEL_BATCH_SIZE', 32))
+        # Embeddings persisted across restarts, disabled if the path is empty
+        self.embedding_cache_path = os.getenv(
+            'EMBEDDING_CACHE_PATH', os.path.join(self.cache_dir, 'embeddings.sqlite')
+        )
+        self.embedding_cache_memory_size = int(os.getenv('EMBEDDING_CACHE_MEMORY_SIZE', 10000))
+        self.embedding_cache: EmbeddingCache | None = None
+        # Concurrent small requests (intent, retrieval, other API workers) share one encode call
+        self.batcher = AsyncBatcher(
+            self._embed_requests,
+            max_batch=int(os.getenv('EMBEDDING_REQUEST_BATCH_SIZE', 16)),
+            max_wait=float(os.getenv('EMBEDDING_REQUEST_BATCH_WAIT_MS', 10)) / 1000
+        )
+        # Half precision weights: float16 on GPU, bfloat16 on CPUs with native bf16 (AVX512-BF16/AMX)
+        # and float32 on other CPUs ("auto"), or an explicit torch dtype name
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.dtype = os.getenv('EMBEDDING_DTYPE', 'auto')
+        # "torch", or "onnx" / "openvino" to run an exported graph (sentence-transformers >= 3.2);
+        # EMBEDDING_MODEL_FILE selects a file of the export, e.g. an int8 quantized one
+        self.backend = os.getenv('EMBEDDING_BACKEND', 'torch').lower()
+        self.model_file = os.getenv('EMBEDDING_MODEL_FILE', '')
+    
+    def _torch_dtype(self) -> torch.dtype:
+        """Resolve the configured dtype for the detected device"""
+        if self.dtype == 'auto':
+            if self.device == "cuda":
+                return torch.float16
+            # Without hardware support bf16 matmuls are emulated, slower than float32
+            try:
+                bf16_supported = torch.ops.mkldnn._is_mkldnn_bf16_supported()
+            except Exception:
+                bf16_supported = False
+            return torch.bfloat16 if bf16_supported else torch.float32
+        return getattr(torch, self.dtype)
     
+    def _model_kwargs(self) -> Dict:
+        """Keyword arguments of SentenceTransformer for the configured backend"""
+        if self.backend == "torch":
+            return {"model_kwargs": {"torch_dtype": self._torch_dtype()}}
+        model_kwargs = {"file_name": self.model_file} if self.model_file else {}
+        if self.backend == "onnx":
+            model_kwargs["provider"] = (
+                "CUDAExecutionProvider" if self.device == "cuda" else "CPUExecutionProvider"
+            )
+        return {"backend": self.backend, "model_kwargs": model_kwargs}
+
     def load_model(self):
         """Load embedding model"""
         if self.model is None:
             try:
-                logger.info(f"Loading embedding model: {self.model_name}")
+                logger.info(f"Loading embedding model: {self.model_name} ({self.device}, {self.backend})")
                 # Create cache directory if it doesn't exist
                 os.makedirs(self.cache_dir, exist_ok=True)
                 
                 # Load model with SentenceTransformer
                 self.model = SentenceTransformer(
                     self.model_name,
-                    cache_folder=self.cache_dir
+                    cache_folder=self.cache_dir,
+                    device=self.device,
+                    **self._model_kwargs()
                 )
                 logger.info("Embedding model loaded successfully")
+                self._warmup()
+
+                if self.embedding_cache_path:
+                    self.embedding_cache = EmbeddingCache(
+                        self.embedding_cache_path, self.model_name, self.embedding_cache_memory_size,
+                        backend=self.backend, model_file=self.model_file,
+                        dtype=str(self._torch_dtype()) if self.backend == "torch" else ""
+                    )
+                    logger.info(f"Embedding cache opened at {self.embedding_cache_path}")
 
             except Exception as e:
                 logger.error(f"Failed to load embedding model: {e}")
                 raise
     
-    async def generate_embedding(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for text(s) with batching to manage GPU memory"""
+    def _warmup(self):
+        """Encode dummy batches of the serving sizes so the first request does not pay for kernel setup"""
+        for size in sorted({1, 8, self.batch_size}):
+            self._encode(["warmup"] * size)
+        logger.info("Embedding model warmed up")
+
+    async def generate_embedding(self, texts: List[str]) -> np.ndarray | List[List[float]]:
+        """
+        Generate embeddings for text(s), batched by the model to manage GPU memory
+        
+        Returns:
+            np.ndarray | List[List[float]]: (N, dim) float32 array, a list of empty embeddings on failure
+        """
         try:
-            all_embeddings = []
-            
-            # Process texts in batches
-            for i in range(0, len(texts), self.batch_size):
-                batch_texts = texts[i:i + self.batch_size]
-                
-                # Run embedding generation in thread pool
-                loop = asyncio.get_event_loop()
-                batch_embeddings = await loop.run_in_executor(
-                    None,
-                    lambda: self.model.encode(batch_texts, normalize_embeddings=True).tolist()
-                )
-                
-                all_embeddings.extend(batch_embeddings)
-                
-                # Clear GPU cache after each batch
-                torch.cuda.empty_cache()
-                gc.collect()
-            
-            return all_embeddings
+            # Large requests (indexing) fill encode batches on their own, only small latency
+            # sensitive ones are coalesced so they never wait behind a large encode
+            if len(texts) >= self.batch_size:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(None, self._embed, texts)
+            return await self.batcher.submit(texts)
         
         except Exception as e:
             logger.error(f"Failed to generate embeddings: {e}")
             return [[] for _ in texts]
 
+    async def _embed_requests(self, requests: List[List[str]]) -> List[np.ndarray]:
+        """Embed the texts of several requests with one thread pool call, split back per request"""
+        texts = [text for request in requests for text in request]
+        loop = asyncio.get_running_loop()
+        embeddings = await loop.run_in_executor(None, self._embed, texts)
+        
+        results = []
+        start = 0
+        for request in requests:
+            results.append(embeddings[start:start + len(request)])
+            start += len(request)
+        return results
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, each distinct text once (blocking)"""
+        if not texts:
+            return np.empty((0, self.get_embedding_dimension()), dtype=np.float32)
+        # Repeated texts in a batch (e.g. the same query for intent and knowledge) are encoded once
+        index = {text: i for i, text in enumerate(dict.fromkeys(texts))}
+        if len(index) == len(texts):
+            return self._embed_unique(texts)
+        return self._embed_unique(list(index))[[index[text] for text in texts]]
+
+    def _embed_unique(self, texts: List[str]) -> np.ndarray:
+        """Embed distinct texts, reading and filling the persistent cache (blocking)"""
+        if self.embedding_cache is None:
+            return self._encode(texts)
+        
+        all_embeddings = self.embedding_cache.get_many(texts)
+        missing = [i for i, embedding in enumerate(all_embeddings) if embedding is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            embeddings = self._encode(missing_texts)
+            self.embedding_cache.set_many(missing_texts, embeddings)
+            for i, embedding in zip(missing, embeddings):
+                all_embeddings[i] = embedding
+        logger.info(f"Embedding cache hits: {len(texts) - len(missing)}, misses: {len(missing)}")
+        return np.stack(all_embeddings)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Run the model on texts (blocking)"""
+        # One encode call for all texts, the model splits them into batches of batch_size
+        # without re-entering the thread pool per batch; the model L2-normalizes the whole
+        # batch itself and the (N, dim) array is serialized as is by orjson at the API boundary
+        with torch.inference_mode():
+            embeddings = self.model.encode(
+                texts, batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+            )
+        # Half precision outputs are widened back, the vector fields and the cache expect float32
+        embeddings = embeddings.astype(np.float32, copy=False)
+        
+        # Release cached GPU memory once per request
+        torch.cuda.empty_cache()
+        
+        return embeddings
+
+    def export_quantized_onnx(self, output_dir: str) -> str:
+        """
+        Export the model to ONNX with dynamic int8 quantization for VNNI capable CPUs
+        
+        Args:
+            output_dir: Directory receiving the model, pointed to by EMBEDDING_MODEL afterwards
+        
+        Returns:
+            str: File name to set as EMBEDDING_MODEL_FILE with EMBEDDING_BACKEND=onnx
+        """
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        
+        model = SentenceTransformer(
+            self.model_name, cache_folder=self.cache_dir, device="cpu", backend="onnx"
+        )
+        model.save_pretrained(output_dir)
+        export_dynamic_quantized_onnx_model(model, "avx512_vnni", output_dir)
+        logger.info(f"Exported quantized ONNX embedding model to {output_dir}")
+        return "onnx/model_qint8_avx512_vnni.onnx"
+
+    async def close(self):
+        """Finish the waiting requests and close the persistent embedding cache"""
+        await self.batcher.close()
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
+            self.embedding_cache = None
+
+    @staticmethod
+    def pack_float16(embeddings: np.ndarray | List[List[float]]) -> List[str]:
+        """Encode each embedding as base64 of its float16 bytes, failed (empty) embeddings as empty strings"""
+        return [
+            base64.b64encode(np.asarray(embedding, dtype=np.float16).tobytes()).decode() if len(embedding) else ""
+            for embedding in embeddings
+        ]
+
     def get_embedding_dimension(self) -> int:
         """Get embedding dimension"""
         return self.model.get_sentence_embedding_dimension()
@@ -107,11 +253,11 @@ if __name__ == "__main__":
         embeddings = await embedding_tool.generate_embedding(texts)
         
         print(f"\nGenerated embeddings for {len(texts)} texts")
-        print(f"Embedding dimension: {len(embeddings[0]) if embeddings and embeddings[0] else 0}")
+        print(f"Embedding dimension: {len(embeddings[0]) if len(embeddings) else 0}")
         
         # Show sample embeddings (first 5 dimensions)
         for i, (text, embedding) in enumerate(zip(texts, embeddings)):
-            if embedding:
+            if len(embedding):
                 print(f"\nText {i+1}: {text[:50]}...")
                 print(f"Embedding (first 5 dims): {embedding[:5]}")
                 print(f"Vector norm: {np.linalg.norm(embedding):.4f}")
@@ -2,7 +2,7 @@ try:
     from .prompts import LLMPrompts
 except ImportError:
     from prompts import LLMPrompts
-from transformers import AutoProcessor, AutoModelForImageTextToText, TextIteratorStreamer
+from transformers import AutoProcessor, AutoModelForImageTextToText, AsyncTextIteratorStreamer
 import torch
 import json
 import os
@@ -10,7 +10,6 @@ import asyncio
 from typing import Dict, Generator, AsyncGenerator
 from loguru import logger
 from dotenv import load_dotenv
-from threading import Thread
 load_dotenv()
 
 class LLMService:
@@ -96,7 +95,7 @@ class LLMService:
                     )
                     return generation[0][input_len:]
             
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
             generation = await loop.run_in_executor(None, _generate)
             
             generated_text = self.processor.decode(generation, skip_special_tokens=True)
@@ -120,7 +119,7 @@ class LLMService:
             return ""
 
     async def generate_stream_response(self, service_name: str, *args) -> AsyncGenerator[str, None]:
-        """Generate streaming response using MedGemma model with TextIteratorStreamer"""
+        """Generate streaming response using MedGemma model with AsyncTextIteratorStreamer"""
         try:
             prompt = self._get_prompt(service_name, *args)
             logger.info(f"Streaming prompt for {service_name}")
@@ -139,12 +138,12 @@ class LLMService:
                 return_dict=True, return_tensors="pt"
             ).to(self.model.device, dtype=torch.bfloat16)
             
-            # Create TextIteratorStreamer for streaming output
-            streamer = TextIteratorStreamer(
+            # The async streamer hands tokens to the event loop as they are decoded,
+            # so waiting for the next token never blocks other requests
+            streamer = AsyncTextIteratorStreamer(
                 self.processor.tokenizer,
                 skip_prompt=True,
-                skip_special_tokens=True,
-                timeout=None
+                skip_special_tokens=True
             )
             
             # Generation parameters with streamer
@@ -157,19 +156,19 @@ class LLMService:
                 "streamer": streamer
             }
             
-            # Run generation in separate thread to avoid blocking
+            # Run generation in thread pool to avoid blocking
             def _generate():
                 with torch.inference_mode():
                     self.model.generate(**generation_kwargs)
             
-            thread = Thread(target=_generate)
-            thread.start()
+            loop = asyncio.get_running_loop()
+            generation = loop.run_in_executor(None, _generate)
             
             # Stream tokens as they are generated
-            for new_text in streamer:
+            async for new_text in streamer:
                 yield new_text
                 
-            thread.join()
+            await generation
             
             # Clean up VRAM
             del inputs
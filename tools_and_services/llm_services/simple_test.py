@@ -3,7 +3,7 @@
 Test đơn giản cho LLMService - chỉ test một service cụ thể
 """
 
-import time
+from time import perf_counter
 import os
 import sys
 import asyncio
@@ -42,9 +42,9 @@ def simple_test(service_name='answer', prompt_args=None):
         for i in range(num_runs):
             logger.info(f"Run {i+1}/{num_runs}")
             
-            start_time = time.time()
+            start_time = perf_counter()
             response = llm_service.generate_response(*prompt_args)
-            end_time = time.time()
+            end_time = perf_counter()
             
             response_time = end_time - start_time
             # Ước tính tokens (1 token ≈ 4 ký tự tiếng Việt)
@@ -102,7 +102,7 @@ async def simple_test_streaming(service_name='general', prompt_args=None):
         print("Streaming Response:")
         print("-" * 30)
         
-        start_time = time.time()
+        start_time = perf_counter()
         token_count = 0
         
         async for chunk in service.generate_stream_response(service_name, *prompt_args):
@@ -110,7 +110,7 @@ async def simple_test_streaming(service_name='general', prompt_args=None):
                 print(chunk, end='', flush=True)
                 token_count += len(chunk.split())
                 
-        end_time = time.time()
+        end_time = perf_counter()
         
         print(f"\n\n{'-' * 30}")
         print(f"Streaming completed in {end_time - start_time:.3f}s")
@@ -1,7 +1,11 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from typing import List, Dict, Optional, Any
+from sse_starlette.sse import EventSourceResponse, ServerSentEvent
+from contextlib import asynccontextmanager
+from typing import List, Dict, Optional, Any, Tuple, AsyncGenerator, Literal, Union
 import asyncio
+import orjson
 import uvicorn
 from loguru import logger
 import sys
@@ -13,12 +17,12 @@ from tools_and_services import (
     EmbeddingTool, RerankTool, VectorDBTool, WebSearchTool, MetadataDBTool, LLMService
 )
 
-# Initialize FastAPI app
-app = FastAPI(
-    title="Drug Agentic Chatbot Tools API",
-    description="API endpoints for embedding, rerank, vector DB, metadata DB, web search, LLM tools and services",
-    version="1.0.0"
-)
+# Write logs from a background thread so sinks never block the event loop
+logger.remove()
+logger.add(sys.stderr, level=os.getenv('LOG_LEVEL', 'INFO'), enqueue=True, backtrace=False, diagnose=False)
+if os.getenv('LOG_FILE'):
+    logger.add(os.getenv('LOG_FILE'), level=os.getenv('LOG_LEVEL', 'INFO'), enqueue=True,
+               rotation="100 MB", compression="gz", backtrace=False, diagnose=False)
 
 # Global tool instances
 embedding_tool = None
@@ -28,9 +32,63 @@ web_search_tool = None
 metadata_db_tool = None
 llm_services = None
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize all tools on startup and release their connections on shutdown"""
+    global embedding_tool, rerank_tool, vector_db_tool, web_search_tool, metadata_db_tool, llm_services
+    
+    logger.info("Initializing tools...")
+    
+    # Initialize tools
+    embedding_tool = EmbeddingTool()
+    rerank_tool = RerankTool()
+    vector_db_tool = VectorDBTool()
+    web_search_tool = WebSearchTool()
+    metadata_db_tool = MetadataDBTool()
+
+    # Initialize LLM services
+    llm_services = LLMService()
+    logger.info("LLM service initialized successfully")
+
+    # Load models on GPU
+    logger.info("Loading embedding model...")
+    embedding_tool.load_model()
+    
+    logger.info("Loading rerank model...")
+    rerank_tool.load_model()
+
+    logger.info("Connecting to vector database...")
+    await vector_db_tool.connect()
+
+    logger.info("Connecting to metadata database...")
+    await metadata_db_tool.connect()
+
+    logger.info("All tools initialized successfully!")
+    
+    yield
+    
+    logger.info("Closing database connections...")
+    await metadata_db_tool.close()
+    await vector_db_tool.close()
+    await embedding_tool.close()
+    logger.info("All tools closed")
+
+
+# Initialize FastAPI app
+app = FastAPI(
+    title="Drug Agentic Chatbot Tools API",
+    description="API endpoints for embedding, rerank, vector DB, metadata DB, web search, LLM tools and services",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
+
 # Request models
 class EmbeddingRequest(BaseModel):
     texts: List[str]
+    # "float16" returns each vector as base64 of its float16 bytes, about a fifth of the JSON floats;
+    # /vector_db/insert accepts the packed vectors as they are
+    encoding: Literal["float", "float16"] = "float"
 
 class RerankRequest(BaseModel):
     query: str
@@ -40,6 +98,10 @@ class VectorSearchRequest(BaseModel):
     query_embedding: List[float]
     collection_name: str
 
+class VectorSearchBatchRequest(BaseModel):
+    query_embeddings: List[List[float]]
+    collection_name: str
+
 class VectorInsertRequest(BaseModel):
     collection_name: str
     documents: List[Dict[str, Any]]
@@ -69,7 +131,7 @@ class HealthResponse(BaseModel):
     message: str
 
 class EmbeddingResponse(BaseModel):
-    embeddings: List[List[float]]
+    embeddings: List[Union[List[float], str]]
 
 class DimensionResponse(BaseModel):
     dimension: int
@@ -80,6 +142,9 @@ class RerankResponse(BaseModel):
 class VectorSearchResponse(BaseModel):
     results: List[Dict]
 
+class VectorSearchBatchResponse(BaseModel):
+    results: List[List[Dict]]
+
 class VectorInsertResponse(BaseModel):
     status: str
     message: str
@@ -106,46 +171,16 @@ class WebSearchResponse(BaseModel):
 class LLMResponse(BaseModel):
     response: str
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize all tools on startup"""
-    global embedding_tool, rerank_tool, vector_db_tool, web_search_tool, metadata_db_tool, llm_services
-    
-    logger.info("Initializing tools...")
-    
-    # Initialize tools
-    embedding_tool = EmbeddingTool()
-    rerank_tool = RerankTool()
-    vector_db_tool = VectorDBTool()
-    web_search_tool = WebSearchTool()
-    metadata_db_tool = MetadataDBTool()
-
-    # Initialize LLM services
-    llm_services = LLMService()
-    logger.info("LLM service initialized successfully")
-
-    # Load models on GPU
-    logger.info("Loading embedding model...")
-    embedding_tool.load_model()
-    
-    logger.info("Loading rerank model...")
-    rerank_tool.load_model()
-
-    logger.info("Connecting to vector database...")
-    await vector_db_tool.connect()
-
-    logger.info("Connecting to metadata database...")
-    await metadata_db_tool.connect()
-
-    logger.info("All tools initialized successfully!")
-
 # Embedding endpoints
-@app.post("/embedding/generate_embedding", response_model=EmbeddingResponse)
+@app.post("/embedding/generate_embedding", responses={200: {"model": EmbeddingResponse}})
 async def generate_embedding(request: EmbeddingRequest):
     """Generate embeddings for input texts"""
     try:
         embeddings = await embedding_tool.generate_embedding(request.texts)
-        return EmbeddingResponse(embeddings=embeddings)
+        if request.encoding == "float16":
+            return ORJSONResponse({"embeddings": EmbeddingTool.pack_float16(embeddings)})
+        # orjson serializes the float32 array directly, no per-float Python objects
+        return ORJSONResponse({"embeddings": embeddings})
     
     except Exception as e:
         logger.error(f"Error in generate_embedding: {e}")
@@ -212,6 +247,18 @@ async def search(request: VectorSearchRequest):
         logger.error(f"Error in vector search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     
+@app.post("/vector_db/search_batch", response_model=VectorSearchBatchResponse)
+async def search_batch(request: VectorSearchBatchRequest):
+    """Search vector database for several query embeddings with one Milvus request"""
+    try:
+        results = await vector_db_tool.search_batch(query_embeddings=request.query_embeddings,
+                                                    collection_name=request.collection_name)
+        return VectorSearchBatchResponse(results=results)
+    
+    except Exception as e:
+        logger.error(f"Error in batch vector search: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
 @app.post("/vector_db/insert", response_model=VectorInsertResponse)
 async def insert(request: VectorInsertRequest):
     """Insert documents into vector database"""
@@ -228,7 +275,7 @@ async def insert(request: VectorInsertRequest):
 async def get_vector_db_stats():
     """Get statistics for all vector database collections"""
     try:
-        result = vector_db_tool.get_stats()
+        result = await vector_db_tool.get_stats()
         return VectorDBStatsResponse(**result)
 
     except Exception as e:
@@ -239,7 +286,7 @@ async def get_vector_db_stats():
 async def delete_collection(request: VectorDBDeleteRequest):
     """Delete a collection from vector database"""
     try:
-        result = vector_db_tool.delete_collection(collection_name=request.collection_name)
+        result = await vector_db_tool.delete_collection(collection_name=request.collection_name)
         return VectorDBDeleteResponse(**result)
 
     except Exception as e:
@@ -274,7 +321,7 @@ async def save_conversation(request: MetadataDBRequest):
         logger.error(f"Error in save_conversation: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/metadata_db/get_conversation_history", response_model=MetadataDBHistoryResponse)
+@app.post("/metadata_db/get_conversation_history", responses={200: {"model": MetadataDBHistoryResponse}})
 async def get_conversation_history(request: MetadataDBRequest):
     """Get conversation history for a user"""
     try:
@@ -282,7 +329,9 @@ async def get_conversation_history(request: MetadataDBRequest):
             user_id=request.user_id,
             conversation_id=request.conversation_id
         )
-        return MetadataDBHistoryResponse(history=history)
+        # Rows are serialized once as they come from the database, without building
+        # and re-validating a response model on this per-request path
+        return ORJSONResponse({"history": history})
 
     except Exception as e:
         logger.error(f"Error in get conversation history: {e}")
@@ -323,36 +372,37 @@ async def web_search_health_check():
         return HealthResponse(status="error", message=str(e))
 
 # LLM endpoints
+def _llm_args(request: LLMRequest) -> Tuple:
+    """Validate an LLM request and return the prompt arguments of its service"""
+    if request.service_name == 'structured_query_generator':
+        if not request.query:
+            raise HTTPException(status_code=400, detail="query is required for structured_query_generator")
+        return (request.query,)
+
+    elif request.service_name == 'reflection':
+        if not request.structured_query or not request.context:
+            raise HTTPException(status_code=400, detail="structured_query and context are required for reflection")
+        return (request.structured_query, request.context)
+    
+    elif request.service_name == 'general':
+        if not request.query:
+            raise HTTPException(status_code=400, detail="query is required for general")
+        return (request.query, request.chat_history or [])
+
+    elif request.service_name == 'answer':
+        if not request.query or not request.context:
+            raise HTTPException(status_code=400, detail="query and context are required for answer")
+        return (request.query, request.context, request.chat_history or [])
+
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown service: {request.service_name}")
+
 @app.post("/llm/generate_response", response_model=LLMResponse)
 async def generate_response(request: LLMRequest):
     """Generate response using LLM service"""
     try:
-        # Prepare arguments based on service type
-        if request.service_name == 'structured_query_generator':
-            if not request.query:
-                raise HTTPException(status_code=400, detail="query is required for structured_query_generator")
-            response = await llm_services.generate_response(request.service_name, request.query)
-
-        elif request.service_name == 'reflection':
-            if not request.structured_query or not request.context:
-                raise HTTPException(status_code=400, detail="structured_query and context are required for reflection")
-            response = await llm_services.generate_response(request.service_name, request.structured_query, request.context)
-        
-        elif request.service_name == 'general':
-            if not request.query:
-                raise HTTPException(status_code=400, detail="query is required for general")
-            chat_history = request.chat_history or []
-            response = await llm_services.generate_response(request.service_name, request.query, chat_history)
-
-        elif request.service_name == 'answer':
-            if not request.query or not request.context:
-                raise HTTPException(status_code=400, detail="query and context are required for answer")
-            chat_history = request.chat_history or []
-            response = await llm_services.generate_response(request.service_name, request.query, request.context, chat_history)
-
-        else:
-            raise HTTPException(status_code=400, detail=f"Unknown service: {request.service_name}")
-        
+        args = _llm_args(request)
+        response = await llm_services.generate_response(request.service_name, *args)
         return LLMResponse(response=response)
     
     except HTTPException:
@@ -361,6 +411,25 @@ async def generate_response(request: LLMRequest):
         logger.error(f"Error in generate_response: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/llm/generate_stream_response")
+async def generate_stream_response(request: LLMRequest):
+    """Stream the LLM response as server-sent 'chunk' events followed by 'complete' or 'error'"""
+    # Validate before the stream starts so bad requests still get a 400
+    args = _llm_args(request)
+
+    async def event_stream() -> AsyncGenerator[ServerSentEvent, None]:
+        try:
+            async for chunk in llm_services.generate_stream_response(request.service_name, *args):
+                if chunk:
+                    yield ServerSentEvent(data=orjson.dumps({"content": chunk}).decode(), event="chunk")
+            yield ServerSentEvent(data=orjson.dumps({}).decode(), event="complete")
+        except Exception as e:
+            logger.error(f"Error in generate_stream_response: {e}")
+            yield ServerSentEvent(data=orjson.dumps({"message": str(e)}).decode(), event="error")
+
+    # Keep-alive pings stop proxies from dropping the connection during long generations
+    return EventSourceResponse(event_stream(), ping=15)
+
 @app.get("/llm/health_check", response_model=Dict[str, HealthResponse])
 async def llm_health_check():
     """Health check for LLM services"""
@@ -372,21 +441,25 @@ async def llm_health_check():
         return HealthResponse(status="error", message=str(e))
 
 # Root endpoint
+# Static, so it is serialized once at import time
+_ROOT_PAYLOAD = orjson.dumps({
+    "message": "Drug Agentic Chatbot Tools API",
+    "version": "1.0.0",
+    "services": [
+        "embedding",
+        "rerank", 
+        "vector_db",
+        "web_search",
+        "llm"
+    ],
+    "port": 8001
+})
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
-    return {
-        "message": "Drug Agentic Chatbot Tools API",
-        "version": "1.0.0",
-        "services": [
-            "embedding",
-            "rerank", 
-            "vector_db",
-            "web_search",
-            "llm"
-        ],
-        "port": 8001
-    }
+    return Response(_ROOT_PAYLOAD, media_type="application/json")
 
 # Global health check
 @app.get("/health", response_model=Dict[str, HealthResponse])
@@ -443,5 +516,6 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8001,
         reload=False,
-        log_level="info"
+        log_level="info",
+        loop="uvloop"
     )
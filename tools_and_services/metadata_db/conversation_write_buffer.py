@@ -0,0 +1,101 @@
+import asyncio
+from typing import List, Optional, Tuple
+from loguru import logger
+
+from database.postgres_manager import PostgresManager
+
+
+class ConversationWriteBuffer:
+    """Coalesce conversation saves into multi-row inserts"""
+
+    def __init__(self, postgres_manager: PostgresManager,
+                 max_batch_size: int = 50, max_delay: float = 0.1):
+        """
+        Initialize ConversationWriteBuffer
+
+        Args:
+            postgres_manager: Connected Postgres manager used for the inserts
+            max_batch_size: Flush as soon as this many rows are waiting
+            max_delay: Flush at most this many seconds after the first waiting row
+        """
+        self.postgres_manager = postgres_manager
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background task draining the queue, if it is not running"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain())
+
+    async def enqueue(self, user_id: str, conversation_id: str, query: str, answer: str) -> int:
+        """
+        Queue a conversation turn and wait until its batch is written
+
+        Returns:
+            int: Turn number assigned to the saved row
+        """
+        # Started here too, so a save never waits on a drain task that was never started
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(((user_id, conversation_id, query, answer), future))
+        return await future
+
+    async def _drain(self):
+        """Collect rows until the batch is full or the delay expired, then flush"""
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            item = await self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Tuple[str, str, str, str], asyncio.Future]]):
+        """Write a batch with one INSERT and resolve the waiting callers"""
+        rows = [row for row, _ in batch]
+        try:
+            turns = await self.postgres_manager.save_conversations(rows)
+        except Exception as e:
+            logger.error(f"Failed to flush {len(rows)} conversation turns: {e}")
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+                return
+            # Retry row by row so that only the callers of the failing rows get an error
+            for row, future in batch:
+                try:
+                    turn = await self.postgres_manager.save_conversation(*row)
+                except Exception as row_error:
+                    if not future.done():
+                        future.set_exception(row_error)
+                else:
+                    if not future.done():
+                        future.set_result(turn)
+            return
+
+        for (_, future), turn in zip(batch, turns):
+            if not future.done():
+                future.set_result(turn)
+
+    async def close(self):
+        """Write the rows still waiting and stop the background task"""
+        if self._task is not None:
+            await self.queue.put(None)
+            await self._task
+            self._task = None
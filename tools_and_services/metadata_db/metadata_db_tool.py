@@ -1,4 +1,5 @@
 from database.postgres_manager import PostgresManager
+from tools_and_services.metadata_db.conversation_write_buffer import ConversationWriteBuffer
 from typing import List, Dict, Any
 from loguru import logger
 import os
@@ -10,6 +11,11 @@ class MetadataDBTool:
     def __init__(self):
         self.postgres_manager = PostgresManager()
         self.limit_conversations = int(os.getenv('LIMIT_CONVERSATIONS', 3))
+        self.write_buffer = ConversationWriteBuffer(
+            self.postgres_manager,
+            max_batch_size=int(os.getenv('CONVERSATION_BATCH_SIZE', 50)),
+            max_delay=float(os.getenv('CONVERSATION_FLUSH_INTERVAL', 0.1))
+        )
     
     async def connect(self):
         """Connect to Postgres database"""
@@ -17,6 +23,7 @@ class MetadataDBTool:
             await self.postgres_manager.connect()
             await self.postgres_manager.create_tables("conversations")
             await self.postgres_manager.create_tables("personal_information")
+            self.write_buffer.start()
             logger.info("Connected to Postgres database successfully")
         except Exception as e:
             logger.error(f"Failed to connect to Postgres database: {e}")
@@ -37,12 +44,9 @@ class MetadataDBTool:
         Returns:
             bool: True if saved successfully, False otherwise
         """
-        try:            
-            # Get next turn number
-            turn = await self.postgres_manager.get_next_turn(user_id, conversation_id)
-            
-            # Save conversation
-            await self.postgres_manager.save_conversation(user_id, conversation_id, turn, query, answer)
+        try:
+            # Saves are coalesced into multi-row inserts, the turn number is assigned on insert
+            turn = await self.write_buffer.enqueue(user_id, conversation_id, query, answer)
             
             logger.info(f"Conversation saved successfully for user {user_id}")
             return {"status": "success", 
@@ -79,6 +83,7 @@ class MetadataDBTool:
     async def close(self):
         """Close database connection"""
         try:
+            await self.write_buffer.close()
             await self.postgres_manager.close()
             logger.info("Postgres database connection closed successfully")
         except Exception as e:
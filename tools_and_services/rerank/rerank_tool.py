@@ -16,7 +16,7 @@ class RerankTool:
         self.tokenizer = None
         self.cache_dir = os.path.join(os.path.dirname(__file__), 'cache')
         self.max_length = 1024
-        self.batch_size = 2
+        self.batch_size = int(os.getenv('RERANK_BATCH_SIZE', 2))
         
         # Task instruction for drug/disease/gene reranking
         self.task_instruction = "Cho một truy vấn (Query) y tế với nội dung về thuốc, bệnh, gen. Hãy xác định xem tài liệu (Document) có liên quan để trả lời truy vấn hay không."
@@ -97,28 +97,27 @@ class RerankTool:
         inputs = {k: v.to(self.model.device) for k, v in inputs.items()}
         return inputs
     
+    # no_grad is thread-local, so it must wrap the function running in the executor
     @torch.no_grad()
-    async def compute_logits(self, inputs: Dict) -> List[float]:
-        """Compute relevance scores using Qwen3-Reranker (async for GPU operations)"""
-        loop = asyncio.get_event_loop()
+    def _compute_scores(self, inputs: Dict) -> List[float]:
+        """Relevance score of each tokenized pair (blocking)"""
+        batch_scores = self.model(**inputs).logits[:, -1, :]
+        true_vector = batch_scores[:, self.token_true_id]
+        false_vector = batch_scores[:, self.token_false_id]
+        batch_scores = torch.stack([false_vector, true_vector], dim=1)
+        batch_scores = torch.nn.functional.log_softmax(batch_scores, dim=1)
+        return batch_scores[:, 1].exp().tolist()
+
+    def _score_pairs(self, pairs: List[str]) -> List[float]:
+        """Tokenize and score all pairs batch by batch within one thread pool call (blocking)"""
+        scores = []
+        for i in range(0, len(pairs), self.batch_size):
+            inputs = self.process_inputs(pairs[i:i + self.batch_size])
+            scores.extend(self._compute_scores(inputs))
+            del inputs
         
-        # Run model inference in thread pool to avoid blocking
-        def _inference():
-            batch_scores = self.model(**inputs).logits[:, -1, :]
-            true_vector = batch_scores[:, self.token_true_id]
-            false_vector = batch_scores[:, self.token_false_id]
-            batch_scores = torch.stack([false_vector, true_vector], dim=1)
-            batch_scores = torch.nn.functional.log_softmax(batch_scores, dim=1)
-            scores = batch_scores[:, 1].exp().tolist()
-
-            # Clean up GPU memory
-            del batch_scores, true_vector, false_vector
-            torch.cuda.empty_cache()
-
-            return scores
-        
-        scores = await loop.run_in_executor(None, _inference)
-        del inputs  # Clear inputs to free memory
+        # Clean up GPU memory once for the whole request
+        torch.cuda.empty_cache()
         return scores
 
     def elbow_pruning(self, chunks: List[Dict]) -> List[Dict]:
@@ -173,31 +172,18 @@ class RerankTool:
                 formatted_pair = self.format_instruction(query, content)
                 pairs.append(formatted_pair)
             
-            # Process pairs in batches
-            all_scores = []
-            for i in range(0, len(pairs), self.batch_size):
-                batch_pairs = pairs[i:i + self.batch_size]
-                inputs = self.process_inputs(batch_pairs)
-                batch_scores = await self.compute_logits(inputs)
-                all_scores.extend(batch_scores)
+            # Tokenize and score all batches in one thread pool call instead of
+            # two event loop round trips per batch
+            loop = asyncio.get_running_loop()
+            all_scores = await loop.run_in_executor(None, self._score_pairs, pairs)
             
-            # Combine chunks with scores and sort
-            chunks_with_scores = []
-            for i, chunk in enumerate(chunks):
-                chunk_copy = chunk.copy()
+            # Order by rerank score (descending), only the kept chunks are copied
+            order = sorted(range(len(chunks)), key=all_scores.__getitem__, reverse=True)
+            reranked_chunks = []
+            for i in order[:top_k] if top_k is not None else order:
+                chunk_copy = chunks[i].copy()
                 chunk_copy['rerank_score'] = float(all_scores[i])
-                chunks_with_scores.append(chunk_copy)
-            
-            # Sort by rerank score (descending)
-            reranked_chunks = sorted(
-                chunks_with_scores, 
-                key=lambda x: x['rerank_score'], 
-                reverse=True
-            )
-
-            # Hard limit if top_k is specified
-            if top_k is not None:
-                reranked_chunks = reranked_chunks[:top_k]
+                reranked_chunks.append(chunk_copy)
 
             # Elbow pruning if enabled
             if elbow:
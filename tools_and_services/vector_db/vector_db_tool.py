@@ -40,6 +40,23 @@ class VectorDBTool:
             logger.error(f"Vector search failed: {e}")
             return []
 
+    async def search_batch(self, query_embeddings: List[List[float]],
+                           collection_name: str) -> List[List[Dict]]:
+        """Search knowledge base or intent queries for several query embeddings at once"""
+        try:
+            results = await self.milvus_manager.search_vectors_batch(
+                query_vectors=query_embeddings,
+                collection_name=collection_name,
+                top_k=self.top_k_knowledge if collection_name == "knowledge_base" else self.top_k_intent,
+            )
+
+            logger.info(f"Batch VectorSearch successfully! Searched {len(results)} queries in {collection_name} collection")
+            return results
+        
+        except Exception as e:
+            logger.error(f"Batch vector search failed: {e}")
+            return [[] for _ in query_embeddings]
+
     async def insert(self, collection_name: str, documents: List[Dict[str, Any]]) -> Dict[str, str]:
         """Insert documents into specified collection"""
         try:
@@ -56,11 +73,11 @@ class VectorDBTool:
             logger.error(f"Failed to insert documents: {e}")
             return {"status": "error", "message": str(e)}
 
-    def get_stats(self) -> Dict[str, Any]:
+    async def get_stats(self) -> Dict[str, Any]:
         """Get statistics for all collections"""
         try:
             # Get collection statistics
-            stats = self.milvus_manager.get_collection_stats()
+            stats = await self.milvus_manager.get_collection_stats()
             
             logger.info(f"Retrieved stats for {len(stats)} collections")
             return {
@@ -77,17 +94,21 @@ class VectorDBTool:
                 "stats": {}
             }
 
-    def delete_collection(self, collection_name: str) -> Dict[str, str]:
+    async def delete_collection(self, collection_name: str) -> Dict[str, str]:
         """Delete a collection"""
         try:
             # Delete collection from Milvus
-            result = self.milvus_manager.delete_collection(collection_name)
+            result = await self.milvus_manager.delete_collection(collection_name)
             return result
             
         except Exception as e:
             logger.error(f"Failed to delete collection: {e}")
             return {"status": "error", "message": str(e)}
 
+    async def close(self):
+        """Close connection to Milvus database"""
+        await self.milvus_manager.close()
+
     def health_check(self) -> Dict[str, str]:
         """Health check for vector search service"""
         try:
@@ -25,6 +25,7 @@ class WebSearchTool:
     def __init__(self):
         self.max_results = int(os.getenv('MAX_SEARCH_RESULTS', 3))
         self.allowed_domains = [domain.strip() for domain in os.getenv('ALLOWED_DOMAINS', '').split(',')]
+        self.browser_semaphore = asyncio.Semaphore(int(os.getenv('MAX_CONCURRENT_BROWSERS', 4)))
     
     def _is_allowed_domain(self, url: str) -> bool:
         """Check if URL is from allowed domain"""
@@ -79,6 +80,91 @@ class WebSearchTool:
                 logger.error(f"Fallback text extraction also failed: {fallback_error}")
                 return ""
     
+    async def _search_with_driver(self, driver: webdriver.Chrome, query: str,
+                                  max_retries: int, suffix_domain: str) -> List[str]:
+        """Type the query in DuckDuckGo and collect the result URLs, blocking calls run in threads"""
+        # Execute script to hide webdriver property
+        await asyncio.to_thread(
+            driver.execute_script, "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+        )
+        
+        urls = []
+        
+        for attempt in range(max_retries):
+            try:
+                # Random delay before each attempt
+                if attempt > 0:
+                    delay = random.uniform(0.5, 1)
+                    await asyncio.sleep(delay)
+                
+                # Open DuckDuckGo
+                await asyncio.to_thread(driver.get, "https://duckduckgo.com/")
+                
+                # Random short delay to simulate human behavior
+                await asyncio.sleep(random.uniform(0.1, 0.5))
+
+                # Wait for page to load and find the search box
+                wait = WebDriverWait(driver, 10)
+                search_box = await asyncio.to_thread(
+                    wait.until, EC.presence_of_element_located((By.NAME, "q"))
+                )
+                
+                # Simulate human typing with random delays
+                search_text = f"{query}{suffix_domain}"
+                await asyncio.to_thread(search_box.clear)
+                for char in search_text:
+                    await asyncio.to_thread(search_box.send_keys, char)
+                    if random.random() < 0.1:  # 10% chance of pause
+                        await asyncio.sleep(random.uniform(0.05, 0.1))
+                
+                # Random delay before pressing enter
+                await asyncio.sleep(random.uniform(0.1, 0.5))
+                await asyncio.to_thread(search_box.send_keys, Keys.RETURN)
+
+                # Wait for search results to load
+                await asyncio.sleep(random.uniform(0.1, 0.5))
+                
+                # Try different selectors for search results
+                result_selectors = [
+                    'a[data-testid="result-title-a"]',
+                    'h2 a',
+                    '.result__a',
+                    'a.result__a',
+                    '[data-testid="result-extras-url-link"]'
+                ]
+                
+                # Extract URLs from results
+                urls = await asyncio.to_thread(self._extract_result_urls, driver, result_selectors)
+                
+                # If we found URLs, break out of retry loop
+                if urls:
+                    break
+                    
+            except Exception as e:
+                logger.warning(f"Attempt {attempt + 1} failed: {e}")
+                if attempt < max_retries - 1:
+                    continue
+                else:
+                    raise e
+        
+        return urls
+
+    @staticmethod
+    def _extract_result_urls(driver: webdriver.Chrome, result_selectors: List[str]) -> List[str]:
+        """Return the hrefs of the first selector matching search results"""
+        results = []
+        for selector in result_selectors:
+            results = driver.find_elements(By.CSS_SELECTOR, selector)
+            if results:
+                break
+        
+        urls = []
+        for result in results:
+            href = result.get_attribute('href')
+            if href:
+                urls.append(href)
+        return urls
+
     async def search_urls(self, query: str, max_retries = 2,
                           suffix_domain: str = " vinmec nhathuoclongchau pharmacity"
                           ) -> List[str]:
@@ -104,80 +190,15 @@ class WebSearchTool:
             chrome_options.add_argument("--disable-web-security")
             chrome_options.add_argument("--allow-running-insecure-content")
 
-            # Initialize WebDriver
-            driver = webdriver.Chrome(options=chrome_options)
-            
-            # Execute script to hide webdriver property
-            driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-            
-            urls = []
-            
-            for attempt in range(max_retries):
+            # Browsers are heavy, bound how many run at once. Selenium is blocking,
+            # its calls run in threads so that several queries are searched in parallel
+            async with self.browser_semaphore:
+                driver = await asyncio.to_thread(webdriver.Chrome, options=chrome_options)
                 try:
-                    # Random delay before each attempt
-                    if attempt > 0:
-                        delay = random.uniform(0.5, 1)
-                        await asyncio.sleep(delay)
-                    
-                    # Open DuckDuckGo
-                    driver.get("https://duckduckgo.com/")
-                    
-                    # Random short delay to simulate human behavior
-                    await asyncio.sleep(random.uniform(0.1, 0.5))
-
-                    # Wait for page to load and find the search box
-                    wait = WebDriverWait(driver, 10)
-                    search_box = wait.until(EC.presence_of_element_located((By.NAME, "q")))
-                    
-                    # Simulate human typing with random delays
-                    search_text = f"{query}{suffix_domain}"
-                    search_box.clear()
-                    for char in search_text:
-                        search_box.send_keys(char)
-                        if random.random() < 0.1:  # 10% chance of pause
-                            await asyncio.sleep(random.uniform(0.05, 0.1))
-                    
-                    # Random delay before pressing enter
-                    await asyncio.sleep(random.uniform(0.1, 0.5))
-                    search_box.send_keys(Keys.RETURN)
-
-                    # Wait for search results to load
-                    await asyncio.sleep(random.uniform(0.1, 0.5))
-                    
-                    # Try different selectors for search results
-                    result_selectors = [
-                        'a[data-testid="result-title-a"]',
-                        'h2 a',
-                        '.result__a',
-                        'a.result__a',
-                        '[data-testid="result-extras-url-link"]'
-                    ]
-                    
-                    results = []
-                    for selector in result_selectors:
-                        results = driver.find_elements(By.CSS_SELECTOR, selector)
-                        if results:
-                            break
-
-                    # Extract URLs from results
-                    for result in results:
-                        href = result.get_attribute('href')
-                        if href:
-                            urls.append(href)
-                    
-                    # If we found URLs, break out of retry loop
-                    if urls:
-                        break
-                        
-                except Exception as e:
-                    logger.warning(f"Attempt {attempt + 1} failed: {e}")
-                    if attempt < max_retries - 1:
-                        continue
-                    else:
-                        raise e
-
-            # Ensure the driver is closed
-            driver.quit()
+                    urls = await self._search_with_driver(driver, query, max_retries, suffix_domain)
+                finally:
+                    # Ensure the driver is closed
+                    await asyncio.to_thread(driver.quit)
 
             if not urls:
                 return []
@@ -206,7 +227,9 @@ class WebSearchTool:
             async with session.get(url, timeout=5) as response:
                 if response.status == 200:
                     html_content = await response.text()
-                    text_content = self._extract_text_from_html(html_content)
+                    # HTML parsing is CPU-bound, keep it off the event loop
+                    loop = asyncio.get_running_loop()
+                    text_content = await loop.run_in_executor(None, self._extract_text_from_html, html_content)
                     return {
                         'url': url,
                         'content': text_content,
@@ -296,7 +319,7 @@ class WebSearchTool:
 # Test the WebSearchTool
 if __name__ == "__main__":
     async def test_web_search_tool():
-        start_time = asyncio.get_event_loop().time()
+        start_time = asyncio.get_running_loop().time()
         
         logger.info("Initializing WebSearchTool...")
         web_search_tool = WebSearchTool()
@@ -314,9 +337,9 @@ if __name__ == "__main__":
         for i, query in enumerate(test_queries, 1):
             logger.info(f"  {i}. {query}")
         
-        search_start = asyncio.get_event_loop().time()
+        search_start = asyncio.get_running_loop().time()
         results = await web_search_tool.search_and_fetch(test_queries)
-        search_time = asyncio.get_event_loop().time() - search_start
+        search_time = asyncio.get_running_loop().time() - search_start
         
         logger.info(f"Search and fetch completed in {search_time:.2f}s")
         
@@ -335,7 +358,7 @@ if __name__ == "__main__":
                 logger.info(f"     Preview: {snippet}")
                 total_contents += 1
         
-        total_time = asyncio.get_event_loop().time() - start_time
+        total_time = asyncio.get_running_loop().time() - start_time
         logger.info(f"Test Summary:")
         logger.info(f"- Total queries: {len(test_queries)}")
         logger.info(f"- Total web pages fetched: {total_contents}")
@@ -0,0 +1,3 @@
+from .batcher import AsyncBatcher
+
+__all__ = ['AsyncBatcher']
@@ -0,0 +1,91 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+from loguru import logger
+
+
+class AsyncBatcher:
+    """Coalesce concurrent single-item calls into one batched call"""
+
+    def __init__(self, process: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_batch: int = 32, max_wait: float = 0.008):
+        """
+        Initialize AsyncBatcher
+
+        Args:
+            process: Coroutine function taking a list of items and returning their results in order
+            max_batch: Process as soon as this many items are waiting
+            max_wait: Process at most this many seconds after the first waiting item
+        """
+        self.process = process
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._processing: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queue an item and wait until its batch is processed
+
+        Returns:
+            Any: Result of the item
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain())
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _drain(self):
+        """Collect items until the batch is full or the wait expired, then process"""
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            entry = await self.queue.get()
+            if entry is None:
+                return
+            batch = [entry]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is None:
+                    closing = True
+                    break
+                batch.append(entry)
+            # Process in the background so the next batch can be collected meanwhile
+            task = asyncio.create_task(self._process(batch))
+            self._processing.add(task)
+            task.add_done_callback(self._processing.discard)
+
+    async def _process(self, batch: List[Tuple[Any, asyncio.Future]]):
+        """Process a batch with one call and resolve the waiting callers"""
+        items = [item for item, _ in batch]
+        try:
+            results = await self.process(items)
+            if len(results) != len(items):
+                raise RuntimeError(f"Batch returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            logger.error(f"Failed to process batch of {len(items)} items: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        """Process the waiting items and stop the background task"""
+        if self._task is not None and not self._task.done():
+            await self.queue.put(None)
+            await self._task
+        self._task = None
+        if self._processing:
+            await asyncio.gather(*self._processing)
@@ -1,44 +1,62 @@
-from typing import List, Dict, AsyncGenerator
+from typing import List, Dict, AsyncGenerator, Optional
 from loguru import logger
 import httpx
+import orjson
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from workers.http_client import get_client
+from workers.cache import LRUCache, normalize_query
 
 class Answer:
-    def __init__(self, base_url: str = "http://localhost:8001"):
+    def __init__(self, base_url: str = "http://localhost:8001", client: Optional[httpx.AsyncClient] = None):
         """
         Initialize Answer with base URL for the tools API
         
         Args:
             base_url: Base URL for the tools and services API
+            client: Shared HTTP client, a short-lived one is created per call if not given
         """
         self.base_url = base_url
+        self.client = client
         self.user_id = None
         self.conversation_id = None
+        # General answers of queries asked without history, shared by all users
+        self.general_cache = LRUCache(int(os.getenv('GENERAL_ANSWER_CACHE_SIZE', 1024)))
     
     def set_user_info(self, user_id: str, conversation_id: str):
         """Set user and conversation information"""
         self.user_id = user_id
         self.conversation_id = conversation_id
     
-    async def _get_conversation_history(self) -> List[Dict]:
+    async def get_conversation_history(self, user_id: Optional[str] = None,
+                                       conversation_id: Optional[str] = None) -> List[Dict]:
         """
-        Get conversation history for the current user and conversation
+        Get conversation history for the given (or current) user and conversation
         
+        Args:
+            user_id: User identifier, defaults to the one set with set_user_info
+            conversation_id: Conversation identifier, defaults to the one set with set_user_info
+            
         Returns:
             List[Dict]: History with 'query' and 'answer' keys
         """
-        if not self.user_id or not self.conversation_id:
+        user_id = user_id or self.user_id
+        conversation_id = conversation_id or self.conversation_id
+        if not user_id or not conversation_id:
             logger.warning("User ID or conversation ID not set")
             return []
         
         try:
             url = f"{self.base_url}/metadata_db/get_conversation_history"
             payload = {
-                "user_id": self.user_id,
-                "conversation_id": self.conversation_id
+                "user_id": user_id,
+                "conversation_id": conversation_id
             }
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(url, json=payload)
+            async with get_client(self.client) as client:
+                response = await client.post(url, json=payload, timeout=30.0)
                 if response.status_code == 200:
                     result = response.json()
                     return result.get("history", [])
@@ -103,7 +121,9 @@ class Answer:
 
         return "\n".join(context_parts)
     
-    async def run(self, query: str, service_name: str, context: Dict = None) -> Dict:
+    async def run(self, query: str, service_name: str, context: Dict = None,
+                  user_id: Optional[str] = None, conversation_id: Optional[str] = None,
+                  chat_history: Optional[List[Dict]] = None) -> Dict:
         """
         Run the answer generation process
         
@@ -111,14 +131,32 @@ class Answer:
             query: User query
             service_name: Either 'general' or 'answer'
             context: Context from retriever (only needed for 'answer' service)
+            user_id: User identifier for the history, defaults to the one set with set_user_info
+            conversation_id: Conversation identifier for the history, defaults to the one set with set_user_info
+            chat_history: History already fetched by the caller, fetched here if None
             
         Returns:
-            Dict: Response with 'success', 'query', 'answer', 'message'
+            Dict: Response with 'success', 'query', 'answer', 'message' and, on success,
+            'used_history' telling whether the answer depends on the conversation history
         """
         try:
             if service_name == "general":
                 # For general service, only need conversation history
-                chat_history = await self._get_conversation_history()
+                if chat_history is None:
+                    chat_history = await self.get_conversation_history(user_id, conversation_id)
+                
+                # Without history the answer only depends on the query, greetings repeat a lot
+                cache_key = normalize_query(query) if not chat_history else None
+                answer = self.general_cache.get(cache_key) if cache_key else None
+                if answer is not None:
+                    logger.info(f"General answer cache hit for query: {query}")
+                    return {
+                        "success": True,
+                        "query": query,
+                        "answer": answer,
+                        "message": "Response generated successfully",
+                        "used_history": False
+                    }
                 
                 # Send request to LLM service
                 url = f"{self.base_url}/llm/generate_response"
@@ -128,17 +166,20 @@ class Answer:
                     "chat_history": chat_history
                 }
                 
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    response = await client.post(url, json=payload)
+                async with get_client(self.client) as client:
+                    response = await client.post(url, json=payload, timeout=60.0)
                     if response.status_code == 200:
                         result = response.json()
                         answer = result.get("response", "")
+                        if cache_key and answer:
+                            self.general_cache.set(cache_key, answer)
                         
                         return {
                             "success": True,
                             "query": query,
                             "answer": answer,
-                            "message": "Response generated successfully"
+                            "message": "Response generated successfully",
+                            "used_history": bool(chat_history)
                         }
                     else:
                         return {
@@ -161,7 +202,8 @@ class Answer:
                 parsed_context = self._parse_context(context)
                 
                 # Get conversation history
-                chat_history = await self._get_conversation_history()
+                if chat_history is None:
+                    chat_history = await self.get_conversation_history(user_id, conversation_id)
                 
                 # Send request to LLM service
                 url = f"{self.base_url}/llm/generate_response"
@@ -172,8 +214,8 @@ class Answer:
                     "chat_history": chat_history
                 }
                 
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    response = await client.post(url, json=payload)
+                async with get_client(self.client) as client:
+                    response = await client.post(url, json=payload, timeout=60.0)
                     if response.status_code == 200:
                         result = response.json()
                         answer = result.get("response", "")
@@ -182,7 +224,8 @@ class Answer:
                             "success": True,
                             "query": query,
                             "answer": answer,
-                            "message": "Response generated successfully with context"
+                            "message": "Response generated successfully with context",
+                            "used_history": bool(chat_history)
                         }
                     else:
                         return {
@@ -209,6 +252,58 @@ class Answer:
                 "message": f"Error: {str(e)}"
             }
 
+    
+    async def run_stream(self, query: str, service_name: str, context: Dict = None,
+                         user_id: Optional[str] = None, conversation_id: Optional[str] = None,
+                         chat_history: Optional[List[Dict]] = None) -> AsyncGenerator[str, None]:
+        """
+        Stream the answer tokens as the LLM generates them
+        
+        Args:
+            query: User query
+            service_name: Either 'general' or 'answer'
+            context: Context from retriever (only needed for 'answer' service)
+            user_id: User identifier for the history, defaults to the one set with set_user_info
+            conversation_id: Conversation identifier for the history, defaults to the one set with set_user_info
+            chat_history: History already fetched by the caller, fetched here if None
+            
+        Yields:
+            str: Answer text chunks
+        """
+        if chat_history is None:
+            chat_history = await self.get_conversation_history(user_id, conversation_id)
+        payload = {
+            "service_name": service_name,
+            "query": query,
+            "chat_history": chat_history
+        }
+        if service_name == "answer":
+            if not context:
+                raise ValueError("Context is required for answer service")
+            payload["context"] = self._parse_context(context)
+        elif service_name != "general":
+            raise ValueError(f"Unknown service name: {service_name}")
+        
+        url = f"{self.base_url}/llm/generate_stream_response"
+        async with get_client(self.client) as client:
+            async with client.stream("POST", url, json=payload, timeout=60.0) as response:
+                if response.status_code != 200:
+                    raise RuntimeError(f"LLM service failed with status {response.status_code}")
+                
+                # Server-sent events: an 'event:' line names the type of the following 'data:' line
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        data = orjson.loads(line[5:])
+                        if event == "chunk":
+                            yield data["content"]
+                        elif event == "error":
+                            raise RuntimeError(f"LLM streaming failed: {data.get('message')}")
+                        elif event == "complete":
+                            return
+
 
 async def main():
     """Test function for the Answer class"""
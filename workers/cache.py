@@ -0,0 +1,147 @@
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query to be used as cache key
+
+    Unicode variants are collapsed with NFKC, whitespace is squeezed and the
+    text is lowercased so that trivially different spellings share an entry.
+
+    Args:
+        query: Raw user query
+
+    Returns:
+        str: Normalized query
+    """
+    return " ".join(unicodedata.normalize("NFKC", query).lower().split())
+
+
+class LRUCache:
+    """Bounded in-process least-recently-used cache with optional expiry"""
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 4096, ttl: Optional[float] = None):
+        """
+        Initialize LRUCache
+
+        Args:
+            maxsize: Maximum number of entries kept, the least recently used is evicted first
+            ttl: Seconds after which an entry expires, entries never expire if None
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Return the cached value for key and mark it as recently used"""
+        try:
+            value, expires_at = self._data[key]
+        except KeyError:
+            return default
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value for key, evicting the least recently used entry if full"""
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, self._MISSING) is not self._MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SemanticCache:
+    """Approximate cache keyed by embeddings, a lookup hits when the cosine similarity exceeds a threshold"""
+
+    def __init__(self, maxsize: int = 10000, threshold: float = 0.95, ttl: Optional[float] = None):
+        """
+        Initialize SemanticCache
+
+        Args:
+            maxsize: Maximum number of entries kept, the least recently used is evicted first
+            threshold: Minimum cosine similarity between embeddings for a hit
+            ttl: Seconds after which an entry expires, entries never expire if None
+        """
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        self._size = 0
+        self._clock = 0
+        # Allocated on the first insert, once the embedding dimension is known
+        self._embeddings: Optional[np.ndarray] = None
+        self._expires_at = np.full(maxsize, np.inf)
+        self._last_used = np.zeros(maxsize, dtype=np.int64)
+        self._values: List[Any] = [None] * maxsize
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        """Return the embedding as a unit float32 vector"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _touch(self, slot: int) -> None:
+        self._clock += 1
+        self._last_used[slot] = self._clock
+
+    def get(self, embedding: List[float], default: Optional[Any] = None) -> Any:
+        """Return the value of the most similar live entry if it is similar enough"""
+        if self._size == 0:
+            return default
+        # Exact search with one BLAS matrix-vector product, about a millisecond for 10k
+        # 1024-d entries, so no approximate index (LSH) is needed at this size
+        similarities = self._embeddings[:self._size] @ self._normalize(embedding)
+        if self.ttl is not None:
+            similarities[self._expires_at[:self._size] <= time.monotonic()] = -np.inf
+        slot = int(np.argmax(similarities))
+        if similarities[slot] < self.threshold:
+            return default
+        self._touch(slot)
+        return self._values[slot]
+
+    def set(self, embedding: List[float], value: Any) -> None:
+        """Store value for embedding, evicting the least recently used entry if full"""
+        if self.maxsize <= 0:
+            return
+        vector = self._normalize(embedding)
+        if self._embeddings is None:
+            self._embeddings = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+        if self._size < self.maxsize:
+            slot = self._size
+            self._size += 1
+        else:
+            slot = int(np.argmin(self._last_used))
+        self._embeddings[slot] = vector
+        self._expires_at[slot] = time.monotonic() + self.ttl if self.ttl is not None else np.inf
+        self._values[slot] = value
+        self._touch(slot)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        self._size = 0
+        self._values = [None] * self.maxsize
+
+    def __len__(self) -> int:
+        return self._size
@@ -0,0 +1,49 @@
+import os
+import httpx
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def create_client() -> httpx.AsyncClient:
+    """
+    Create the process-wide HTTP client shared by all workers
+
+    Keep-alive connections to the tools API are pooled and reused, connection
+    failures are retried by the transport and the default timeout is 30s with a
+    short connect timeout. Callers still override the timeout per request.
+
+    Returns:
+        httpx.AsyncClient: Shared client, to be closed on shutdown
+    """
+    limits = httpx.Limits(
+        max_connections=int(os.getenv('HTTP_MAX_CONNECTIONS', 100)),
+        max_keepalive_connections=int(os.getenv('HTTP_MAX_KEEPALIVE_CONNECTIONS', 50)),
+        keepalive_expiry=30.0
+    )
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(30.0, connect=5.0),
+        transport=httpx.AsyncHTTPTransport(limits=limits, retries=2)
+    )
+
+
+@asynccontextmanager
+async def get_client(client: Optional[httpx.AsyncClient] = None) -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Yield an HTTP client for calling the tools API
+
+    Workers receive the process-wide client from the API lifespan so that
+    connections are pooled across requests. When a worker is used standalone
+    (e.g. from its test main) a short-lived client is created instead.
+    Timeouts are passed per request by the callers.
+
+    Args:
+        client: Shared client, if any
+    """
+    if client is not None:
+        yield client
+    else:
+        async with httpx.AsyncClient() as new_client:
+            yield new_client
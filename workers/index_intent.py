@@ -1,41 +1,58 @@
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, BinaryIO, Iterator, Optional, Union
 import os
+import sys
 import httpx
 import asyncio
 from loguru import logger
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from workers.indexing_pipeline import run_indexing_pipeline
+from workers.http_client import get_client
+
+load_dotenv()
 
 class IndexIntent:
-    def __init__(self, base_url: str = "http://localhost:8001"):
+    def __init__(self, base_url: str = "http://localhost:8001", client: Optional[httpx.AsyncClient] = None):
         """
         Initialize IndexIntent with base URL for the tools API
         
         Args:
             base_url: Base URL for the tools and services API
+            client: Shared HTTP client, a short-lived one is created per call if not given
         """
         self.base_url = base_url
+        self.client = client
+        self.batch_size = int(os.getenv('INDEX_BATCH_SIZE', 1000))
+        self.concurrency = int(os.getenv('INDEX_CONCURRENCY', 2))
 
-    def _create_chunks_from_csv(self, csv_file_path: str) -> List[Dict[str, str]]:
-        """Create chunks from intent_queries.csv"""
-        try:
-            df = pd.read_csv(csv_file_path)
-            # logger.info(f"Number of label medical queries: {df[df['label'] == 'medical'].shape[0]}")
-            # logger.info(f"Number of label non-medical queries: {df[df['label'] != 'medical'].shape[0]}")
-            chunks = []
-            
-            for _, row in df.iterrows():
-                if pd.notna(row['query']) and pd.notna(row['label']):
-                    chunks.append({
-                        'query': row['query'],
-                        'intent_label': row['label']
-                    })
-            
-            logger.info(f"Created {len(chunks)} chunks from CSV")
-            return chunks
-            
-        except Exception as e:
-            logger.error(f"Failed to create chunks from CSV: {str(e)}")
-            return []
+    def _create_chunks_from_df(self, df: pd.DataFrame) -> List[Dict[str, str]]:
+        """Create chunks from a dataframe of intent_queries.csv rows"""
+        chunks = []
+        
+        for _, row in df.iterrows():
+            if pd.notna(row['query']) and pd.notna(row['label']):
+                chunks.append({
+                    'query': row['query'],
+                    'intent_label': row['label']
+                })
+        
+        logger.info(f"Created {len(chunks)} chunks from CSV batch")
+        return chunks
+
+    def iter_batches(self, csv_file_path: Union[str, BinaryIO], batch_size: int = None) -> Iterator[List[Dict[str, str]]]:
+        """
+        Read intent_queries.csv in batches of rows and yield the chunks of each batch
+        
+        Args:
+            csv_file_path: Path to the CSV file, or the open file
+            batch_size: Number of CSV rows per batch (defaults to INDEX_BATCH_SIZE)
+        """
+        for df in pd.read_csv(csv_file_path, chunksize=batch_size or self.batch_size):
+            chunks = self._create_chunks_from_df(df)
+            if chunks:
+                yield chunks
 
     async def _create_embeddings(self, chunks: List[Dict[str, str]]) -> List[Dict[str, Any]]:
         """Create embeddings for chunks"""
@@ -44,10 +61,12 @@ class IndexIntent:
             queries = [chunk['query'] for chunk in chunks]
             
             # Call embedding API
-            async with httpx.AsyncClient(timeout=300.0) as client:
+            async with get_client(self.client) as client:
                 response = await client.post(
                     f"{self.base_url}/embedding/generate_embedding",
-                    json={"texts": queries}
+                    # Packed float16 vectors, forwarded as they are to /vector_db/insert
+                    json={"texts": queries, "encoding": "float16"},
+                    timeout=300.0
                 )
                 response.raise_for_status()
                 embeddings = response.json()["embeddings"]
@@ -74,13 +93,14 @@ class IndexIntent:
         """Insert documents into Milvus via vector_db API"""
         try:
             # Call vector_db insert API
-            async with httpx.AsyncClient(timeout=300.0) as client:
+            async with get_client(self.client) as client:
                 response = await client.post(
                     f"{self.base_url}/vector_db/insert",
                     json={
                         "collection_name": "intent_queries",
                         "documents": documents
-                    }
+                    },
+                    timeout=300.0
                 )
                 response.raise_for_status()
                 result = response.json()
@@ -96,33 +116,51 @@ class IndexIntent:
             logger.error(f"Failed to insert documents: {e}")
             return False
 
-    async def run(self, csv_file_path: str) -> Dict[str, Any]:
-        """Main method to index intent queries"""
-        try:
-            if not os.path.exists(csv_file_path):
-                raise FileNotFoundError(f"CSV file not found: {csv_file_path}")
+    async def embed_and_upsert(self, chunks: List[Dict[str, str]]) -> int:
+        """
+        Create embeddings for a batch of chunks and insert them into Milvus
+        
+        Args:
+            chunks: Batch of chunks created from the CSV
             
-            # Step 1: Create chunks from CSV
-            chunks = self._create_chunks_from_csv(csv_file_path)
-            if not chunks:
+        Returns:
+            int: Number of inserted documents
+        """
+        documents = await self._create_embeddings(chunks)
+        if not documents:
+            raise RuntimeError('No embeddings created')
+        
+        if not await self._insert_chunks(documents):
+            raise RuntimeError('Failed to insert documents')
+        
+        return len(documents)
+
+    async def run(self, csv_file_path: Union[str, BinaryIO], batch_size: int = None) -> Dict[str, Any]:
+        """
+        Main method to index intent queries
+        
+        The CSV is streamed in batches: the next batch is parsed while the previous
+        ones are being embedded and inserted.
+        
+        Args:
+            csv_file_path: Path to the CSV file, or the open file
+            batch_size: Number of CSV rows per batch (defaults to INDEX_BATCH_SIZE)
+        """
+        try:
+            # A missing file surfaces as FileNotFoundError from read_csv
+            document_count = await run_indexing_pipeline(
+                self.iter_batches(csv_file_path, batch_size),
+                self.embed_and_upsert,
+                self.concurrency
+            )
+            if not document_count:
                 return {'success': False, 'message': 'No chunks created from CSV'}
             
-            # Step 2: Create embeddings
-            documents = await self._create_embeddings(chunks)
-            if not documents:
-                return {'success': False, 'message': 'No embeddings created'}
-            
-            # Step 3: Insert into Milvus
-            success = await self._insert_chunks(documents)
-            
-            if success:
-                return {
-                    'success': True,
-                    'message': f'Successfully indexed {len(documents)} intent queries',
-                    'document_count': len(documents)
-                }
-            else:
-                return {'success': False, 'message': 'Failed to insert documents'}
+            return {
+                'success': True,
+                'message': f'Successfully indexed {document_count} intent queries',
+                'document_count': document_count
+            }
                 
         except Exception as e:
             logger.error(f"Indexing failed: {e}")
@@ -131,10 +169,11 @@ class IndexIntent:
     async def delete_collection(self, collection_name: str = 'intent_queries') -> Dict[str, Any]:
         """Delete a collection from Milvus via vector_db API"""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
+            async with get_client(self.client) as client:
                 response = await client.post(
                     f"{self.base_url}/vector_db/delete_collection",
-                    json={"collection_name": collection_name}
+                    json={"collection_name": collection_name},
+                    timeout=5.0
                 )
                 response.raise_for_status()
                 result = response.json()
@@ -150,9 +189,10 @@ class IndexIntent:
     async def get_stats_collection(self) -> Dict[str, Any]:
         """Get statistics of collections from Milvus via vector_db API"""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
+            async with get_client(self.client) as client:
                 response = await client.get(
-                    f"{self.base_url}/vector_db/stats"
+                    f"{self.base_url}/vector_db/stats",
+                    timeout=5.0
                 )
                 response.raise_for_status()
                 result = response.json()
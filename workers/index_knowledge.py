@@ -1,24 +1,35 @@
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, BinaryIO, Iterator, Optional, Union
 import os
+import sys
 import httpx
 import asyncio
 from loguru import logger
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from workers.indexing_pipeline import run_indexing_pipeline
+from workers.http_client import get_client
+
+load_dotenv()
 
 class IndexKnowledge:
-    def __init__(self, base_url: str = "http://localhost:8001"):
+    def __init__(self, base_url: str = "http://localhost:8001", client: Optional[httpx.AsyncClient] = None):
         """
         Initialize Retriever with base URL for the tools API
         
         Args:
             base_url: Base URL for the tools and services API
+            client: Shared HTTP client, a short-lived one is created per call if not given
         """
         self.base_url = base_url
+        self.client = client
+        self.batch_size = int(os.getenv('INDEX_BATCH_SIZE', 1000))
+        self.concurrency = int(os.getenv('INDEX_CONCURRENCY', 2))
 
-    def _create_chunks_from_csv(self, csv_file_path: str) -> List[Dict[str, Any]]:
-        """Create text chunks from CSV knowledge base"""
+    def _create_chunks_from_df(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Create text chunks from a dataframe of knowledge base rows"""
         try:
-            df = pd.read_csv(csv_file_path)
             chunks = []
             
             for id, row in df.iterrows():
@@ -60,13 +71,27 @@ class IndexKnowledge:
                         'metadata': metadata
                     })
             
-            logger.info(f"Created {len(chunks)} chunks from CSV")
-            logger.info(f"Sample content:\n{chunks[0]['content']}")
+            logger.info(f"Created {len(chunks)} chunks from CSV batch")
+            if chunks:
+                logger.info(f"Sample content:\n{chunks[0]['content']}")
             return chunks
             
         except Exception as e:
             logger.error(f"Failed to create chunks from CSV: {e}")
             return []
+
+    def iter_batches(self, csv_file_path: Union[str, BinaryIO], batch_size: int = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Read the knowledge base CSV in batches of rows and yield the chunks of each batch
+        
+        Args:
+            csv_file_path: Path to the CSV file, or the open file
+            batch_size: Number of CSV rows per batch (defaults to INDEX_BATCH_SIZE)
+        """
+        for df in pd.read_csv(csv_file_path, chunksize=batch_size or self.batch_size):
+            chunks = self._create_chunks_from_df(df)
+            if chunks:
+                yield chunks
     
     async def _create_embeddings(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Create embeddings for chunks"""
@@ -75,10 +100,12 @@ class IndexKnowledge:
             contents = [chunk['content'] for chunk in chunks]
             
             # Call embedding API with increased timeout
-            async with httpx.AsyncClient(timeout=300.0) as client:
+            async with get_client(self.client) as client:
                 response = await client.post(
                     f"{self.base_url}/embedding/generate_embedding",
-                    json={"texts": contents}
+                    # Packed float16 vectors, forwarded as they are to /vector_db/insert
+                    json={"texts": contents, "encoding": "float16"},
+                    timeout=300.0
                 )
                 response.raise_for_status()
                 embeddings = response.json()["embeddings"]
@@ -95,7 +122,7 @@ class IndexKnowledge:
                     documents.append(document)
 
             logger.info(f"Created embeddings for {len(documents)} documents")
-            logger.info(f"Sample content and embedding:\n{documents[0]['content']}\n{documents[0]['vector'][:10]}...")
+            logger.info(f"Sample content:\n{documents[0]['content']}")
             return documents
             
         except Exception as e:
@@ -106,13 +133,14 @@ class IndexKnowledge:
         """Insert documents into Milvus via vector_db API"""
         try:
             # Call vector_db insert API with increased timeout
-            async with httpx.AsyncClient(timeout=300.0) as client:
+            async with get_client(self.client) as client:
                 response = await client.post(
                     f"{self.base_url}/vector_db/insert",
                     json={
                         "collection_name": "knowledge_base",
                         "documents": documents
-                    }
+                    },
+                    timeout=300.0
                 )
                 response.raise_for_status()
                 result = response.json()
@@ -128,33 +156,51 @@ class IndexKnowledge:
             logger.error(f"Failed to insert documents: {e}")
             return False
     
-    async def run(self, csv_file_path: str) -> Dict[str, Any]:
-        """Main method to index knowledge base"""
-        try:
-            if not os.path.exists(csv_file_path):
-                raise FileNotFoundError(f"CSV file not found: {csv_file_path}")
+    async def embed_and_upsert(self, chunks: List[Dict[str, Any]]) -> int:
+        """
+        Create embeddings for a batch of chunks and insert them into Milvus
+        
+        Args:
+            chunks: Batch of chunks created from the CSV
             
-            # Step 1: Create chunks from CSV
-            chunks = self._create_chunks_from_csv(csv_file_path)
-            if not chunks:
+        Returns:
+            int: Number of inserted documents
+        """
+        documents = await self._create_embeddings(chunks)
+        if not documents:
+            raise RuntimeError('No embeddings created')
+        
+        if not await self._insert_chunks(documents):
+            raise RuntimeError('Failed to insert documents')
+        
+        return len(documents)
+    
+    async def run(self, csv_file_path: Union[str, BinaryIO], batch_size: int = None) -> Dict[str, Any]:
+        """
+        Main method to index knowledge base
+        
+        The CSV is streamed in batches: the next batch is parsed while the previous
+        ones are being embedded and inserted.
+        
+        Args:
+            csv_file_path: Path to the CSV file, or the open file
+            batch_size: Number of CSV rows per batch (defaults to INDEX_BATCH_SIZE)
+        """
+        try:
+            # A missing file surfaces as FileNotFoundError from read_csv
+            document_count = await run_indexing_pipeline(
+                self.iter_batches(csv_file_path, batch_size),
+                self.embed_and_upsert,
+                self.concurrency
+            )
+            if not document_count:
                 return {'success': False, 'message': 'No chunks created from CSV'}
             
-            # Step 2: Create embeddings
-            documents = await self._create_embeddings(chunks)
-            if not documents:
-                return {'success': False, 'message': 'No embeddings created'}
-            
-            # Step 3: Insert into Milvus
-            success = await self._insert_chunks(documents)
-            
-            if success:
-                return {
-                    'success': True,
-                    'message': f'Successfully indexed {len(documents)} documents',
-                    'document_count': len(documents)
-                }
-            else:
-                return {'success': False, 'message': 'Failed to insert documents'}
+            return {
+                'success': True,
+                'message': f'Successfully indexed {document_count} documents',
+                'document_count': document_count
+            }
                 
         except Exception as e:
             logger.error(f"Indexing failed: {e}")
@@ -164,10 +210,11 @@ class IndexKnowledge:
     async def delete_collection(self, collection_name: str = 'knowledge_base') -> Dict[str, Any]:
         """Delete a collection from Milvus via vector_db API"""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
+            async with get_client(self.client) as client:
                 response = await client.post(
                     f"{self.base_url}/vector_db/delete_collection",
-                    json={"collection_name": collection_name}
+                    json={"collection_name": collection_name},
+                    timeout=5.0
                 )
                 response.raise_for_status()
                 result = response.json()
@@ -183,9 +230,10 @@ class IndexKnowledge:
     async def get_stats_collection(self):
         """Get statistics of a collection from Milvus via vector_db API"""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
+            async with get_client(self.client) as client:
                 response = await client.get(
-                    f"{self.base_url}/vector_db/stats"
+                    f"{self.base_url}/vector_db/stats",
+                    timeout=5.0
                 )
                 response.raise_for_status()
                 result = response.json()
@@ -0,0 +1,56 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Iterator, List
+from loguru import logger
+
+
+async def run_indexing_pipeline(batches: Iterator[List[Any]],
+                                index_batch: Callable[[List[Any]], Awaitable[int]],
+                                concurrency: int = 2) -> int:
+    """
+    Index batches with a producer/consumer pipeline
+
+    The producer reads the next batch from disk in a worker thread while up to
+    `concurrency` consumers embed and insert the batches already read, so parsing,
+    embedding and inserting overlap and only a few batches are held in memory.
+
+    Args:
+        batches: Iterator yielding batches of chunks (e.g. rows of a CSV chunk)
+        index_batch: Coroutine function that indexes one batch and returns its document count
+        concurrency: Number of batches indexed concurrently
+
+    Returns:
+        int: Total number of indexed documents
+    """
+    concurrency = max(1, concurrency)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+    document_count = 0
+
+    async def produce():
+        while True:
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+            await queue.put(batch)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def consume():
+        nonlocal document_count
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            count = await index_batch(batch)
+            document_count += count
+            logger.info(f"Indexed {document_count} documents so far")
+
+    tasks = [asyncio.create_task(produce())]
+    tasks.extend(asyncio.create_task(consume()) for _ in range(concurrency))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # Stop the remaining stages if one of them failed
+        for task in tasks:
+            task.cancel()
+
+    return document_count
@@ -1,36 +1,108 @@
 from typing import Optional, Dict, Any, List
 from loguru import logger
+from dotenv import load_dotenv
 import httpx
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from workers.http_client import get_client
+from workers.cache import LRUCache, normalize_query
+from utils.batcher import AsyncBatcher
+
+load_dotenv()
 
 class IntentClassification:
-    def __init__(self, base_url: str = "http://localhost:8001"):
+    # Bumped after the intent queries are re-indexed, part of the label cache key
+    index_version = 0
+    
+    def __init__(self, base_url: str = "http://localhost:8001", client: Optional[httpx.AsyncClient] = None):
         """
         Initialize IntentClassification with base URL for the tools API
         
         Args:
             base_url: Base URL for the tools and services API
+            client: Shared HTTP client, a short-lived one is created per call if not given
         """
         self.base_url = base_url
+        self.client = client
+        self.cache = LRUCache(int(os.getenv('QUERY_CACHE_SIZE', 4096)))
+        self.embedding_cache = LRUCache(int(os.getenv('QUERY_CACHE_SIZE', 4096)))
+        
+        # Concurrent requests share one embedding call
+        self.embedding_batcher = AsyncBatcher(
+            self._create_embeddings,
+            max_batch=int(os.getenv('EMBEDDING_BATCH_SIZE', 32)),
+            max_wait=float(os.getenv('EMBEDDING_BATCH_WAIT_MS', 8)) / 1000
+        )
+        # Concurrent intent searches share one vector database request
+        self.search_batcher = AsyncBatcher(
+            self._search_intents,
+            max_batch=int(os.getenv('VECTOR_SEARCH_BATCH_SIZE', 32)),
+            max_wait=float(os.getenv('VECTOR_SEARCH_BATCH_WAIT_MS', 5)) / 1000
+        )
+
+    @classmethod
+    def bump_index_version(cls):
+        """Invalidate cached intent labels of all classifiers in this process"""
+        cls.index_version += 1
+        logger.info(f"Intent index version bumped to {cls.index_version}")
+
+    @staticmethod
+    def _label_key(query: str) -> tuple:
+        """Key of the label cache, labels computed against an older intent index never match"""
+        return (normalize_query(query), IntentClassification.index_version)
+
+    def cached_label(self, query: str) -> Optional[str]:
+        """Return the cached intent label of a query, None if it is not known yet"""
+        return self.cache.get(self._label_key(query))
 
     async def _create_embedding(self, query: str) -> List[float]:
         """Generate embedding for query"""
-        async with httpx.AsyncClient() as client:
+        return await self.embedding_batcher.submit(query)
+
+    async def embed(self, query: str) -> List[float]:
+        """
+        Return the embedding of a query, reusing the one computed earlier if any
+        
+        Args:
+            query: The input query
+            
+        Returns:
+            Query embedding
+        """
+        cache_key = normalize_query(query)
+        embedding = self.embedding_cache.get(cache_key)
+        if embedding is None:
+            embedding = await self._create_embedding(query)
+            self.embedding_cache.set(cache_key, embedding)
+        return embedding
+
+    async def _create_embeddings(self, queries: List[str]) -> List[List[float]]:
+        """Generate embeddings for several queries with one request"""
+        async with get_client(self.client) as client:
             response = await client.post(
                 f"{self.base_url}/embedding/generate_embedding",
-                json={"texts": [query]}
+                json={"texts": queries},
+                timeout=5.0 + 0.1 * len(queries)
             )
             response.raise_for_status()
-            return response.json()["embeddings"][0]
+            return response.json()["embeddings"]
 
     async def _search_intent(self, embedding: List[float]) -> List[Dict[str, Any]]:
         """Search similar intents using vector database"""
-        async with httpx.AsyncClient() as client:
+        return await self.search_batcher.submit(embedding)
+
+    async def _search_intents(self, embeddings: List[List[float]]) -> List[List[Dict[str, Any]]]:
+        """Search similar intents of several embeddings with one vector database request"""
+        async with get_client(self.client) as client:
             response = await client.post(
-                f"{self.base_url}/vector_db/search",
+                f"{self.base_url}/vector_db/search_batch",
                 json={
-                    "query_embedding": embedding,
+                    "query_embeddings": embeddings,
                     "collection_name": "intent_queries"
-                }
+                },
+                timeout=5.0 + 0.1 * len(embeddings)
             )
             response.raise_for_status()
             return response.json()["results"]
@@ -52,9 +124,15 @@ class IntentClassification:
         Returns:
             Intent label: 'medical' or 'general'
         """
+        cache_key = self._label_key(query)
+        intent_label = self.cache.get(cache_key)
+        if intent_label is not None:
+            logger.info(f"Intent cache hit for query: {query}")
+            return intent_label
+        
         try:
             # Step 1: Generate embedding for query
-            embedding = await self._create_embedding(query)
+            embedding = await self.embed(query)
             logger.info(f"Generated embedding for query: {query}")
             
             # Step 2: Search similar intents
@@ -65,12 +143,56 @@ class IntentClassification:
             intent_label = self._count_label(search_results)
             logger.info(f"Classified intent as: {intent_label}")
             
+            # No results means a failed search or no intent index yet, not a classification
+            if search_results:
+                self.cache.set(cache_key, intent_label)
             return intent_label
             
         except Exception as e:
             logger.error(f"Error in intent classification: {e}")
             return "general"  # Default fallback
 
+    async def run_batch(self, queries: List[str]) -> List[str]:
+        """
+        Classify intent for several queries
+        
+        Cached queries are answered directly, the remaining ones are embedded
+        with a single request and searched with another one.
+        
+        Args:
+            queries: The input queries to classify
+            
+        Returns:
+            Intent labels in the same order as the queries
+        """
+        labels = {}
+        pending = {}
+        for query in queries:
+            cache_key = self._label_key(query)
+            intent_label = self.cache.get(cache_key)
+            if intent_label is not None:
+                labels[cache_key] = intent_label
+            else:
+                pending.setdefault(cache_key, query)
+        logger.info(f"Intent cache hits: {len(labels)}, misses: {len(pending)}")
+        
+        if pending:
+            try:
+                embeddings = await self._create_embeddings(list(pending.values()))
+                search_results = await self._search_intents(embeddings)
+                for cache_key, embedding in zip(pending, embeddings):
+                    self.embedding_cache.set(cache_key[0], embedding)
+                for cache_key, results in zip(pending, search_results):
+                    intent_label = self._count_label(results)
+                    labels[cache_key] = intent_label
+                    if results:
+                        self.cache.set(cache_key, intent_label)
+                logger.info(f"Classified {len(pending)} queries")
+            except Exception as e:
+                logger.error(f"Error in batch intent classification: {e}")
+        
+        return [labels.get(self._label_key(query), "general") for query in queries]
+
 
 async def main():
     """Test the IntentClassification functionality"""
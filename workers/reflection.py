@@ -1,22 +1,33 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 import httpx
 import json
 import re
 from dotenv import load_dotenv
 from loguru import logger
 import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from workers.http_client import get_client
 
 load_dotenv()
 
 class Reflection:
-    def __init__(self, base_url: str = "http://localhost:8001"):
+    def __init__(self, base_url: str = "http://localhost:8001", client: Optional[httpx.AsyncClient] = None):
         """
         Initialize Retriever with base URL for the tools API
         
         Args:
             base_url: Base URL for the tools and services API
+            client: Shared HTTP client, a short-lived one is created per call if not given
         """
         self.base_url = base_url
+        self.client = client
+        
+        # Thresholds for deciding sufficiency without the LLM
+        self.sufficient_score = float(os.getenv('REFLECTION_SUFFICIENT_SCORE', 0.85))
+        self.sufficient_min_results = int(os.getenv('REFLECTION_SUFFICIENT_MIN_RESULTS', 3))
 
     def _parse_context(self, context: Dict) -> Tuple[str, str]:
         """
@@ -52,6 +63,41 @@ class Reflection:
         # logger.info(f"Parsed content:\n{formatted_context}")
         return structured_query, formatted_context
 
+    def _check_without_llm(self, structured_query: str, context: Dict) -> Optional[Dict]:
+        """
+        Decide sufficiency from the retrieval results alone when it is obvious
+        
+        Args:
+            structured_query: The query string
+            context: Dict containing search results (web_search and/or vector_search)
+            
+        Returns:
+            Reflection result, or None if the LLM has to decide
+        """
+        web_search = context.get('web_search', {})
+        vector_search = context.get('vector_search', [])
+        
+        # Nothing retrieved at all
+        if not any(web_search.values()) and not vector_search:
+            logger.info("Reflection skipped: no retrieval results, insufficient")
+            return {
+                "sufficient": False,
+                "follow_up_query": structured_query
+            }
+        
+        # Enough highly relevant knowledge base chunks (sorted by rerank score)
+        top_score = vector_search[0].get('rerank_score', 0) if vector_search else 0
+        if len(vector_search) >= self.sufficient_min_results and top_score >= self.sufficient_score:
+            logger.info(f"Reflection skipped: {len(vector_search)} chunks, top rerank score {top_score:.3f} "
+                        f">= {self.sufficient_score}, sufficient")
+            return {
+                "sufficient": True,
+                "follow_up_query": ""
+            }
+        
+        logger.info(f"Reflection needs LLM: {len(vector_search)} chunks, top rerank score {top_score:.3f}")
+        return None
+
     async def run(self, structured_query: str, context: Dict) -> Dict:
         """
         Run reflection process: parse context and generate response via LLM service
@@ -65,7 +111,13 @@ class Reflection:
             - sufficient: bool
             - follow_up_query: str
         """
+        query_to_use = structured_query
         try:
+            # Short-circuit the obvious cases
+            result = self._check_without_llm(structured_query, context)
+            if result is not None:
+                return result
+            
             # Parse context to get formatted string
             parsed_query, formatted_context = self._parse_context(context)
             # logger.info(f"Parsed query: {parsed_query}")
@@ -84,8 +136,8 @@ class Reflection:
             
             # Send request to LLM service
             url = f"{self.base_url}/llm/generate_response"
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(url, json=payload)
+            async with get_client(self.client) as client:
+                response = await client.post(url, json=payload, timeout=30.0)
                 
                 if response.status_code != 200:
                     logger.error(f"LLM service request failed with status {response.status_code}")
@@ -1,26 +1,98 @@
 import asyncio
+import hashlib
 import httpx
 from typing import List, Dict, Optional, Tuple
 from loguru import logger
+from dotenv import load_dotenv
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from workers.http_client import get_client
+from workers.cache import LRUCache
+from utils.batcher import AsyncBatcher
+
+load_dotenv()
 
 
 class Retriever:
-    def __init__(self, base_url: str = "http://localhost:8001"):
+    # Bumped after the knowledge base is re-indexed, part of the vector results cache key
+    index_version = 0
+    
+    def __init__(self, base_url: str = "http://localhost:8001", client: Optional[httpx.AsyncClient] = None):
         """
         Initialize Retriever with base URL for the tools API
         
         Args:
             base_url: Base URL for the tools and services API
+            client: Shared HTTP client, a short-lived one is created per call if not given
         """
         self.base_url = base_url
+        self.client = client
+        
+        # Embeddings are deterministic, results change when the knowledge base is re-indexed
+        self.embedding_cache = LRUCache(int(os.getenv('RETRIEVER_EMBEDDING_CACHE_SIZE', 8192)))
+        self.results_cache = LRUCache(
+            int(os.getenv('RETRIEVER_RESULTS_CACHE_SIZE', 1024)),
+            ttl=float(os.getenv('RETRIEVER_RESULTS_CACHE_TTL', 600))
+        )
+        
+        # Concurrent requests share one embedding call
+        self.embedding_batcher = AsyncBatcher(
+            self._create_embeddings,
+            max_batch=int(os.getenv('EMBEDDING_BATCH_SIZE', 32)),
+            max_wait=float(os.getenv('EMBEDDING_BATCH_WAIT_MS', 8)) / 1000
+        )
+        # Concurrent knowledge searches share one vector database request
+        self.search_batcher = AsyncBatcher(
+            self._search_knowledge,
+            max_batch=int(os.getenv('VECTOR_SEARCH_BATCH_SIZE', 32)),
+            max_wait=float(os.getenv('VECTOR_SEARCH_BATCH_WAIT_MS', 5)) / 1000
+        )
+    
+    @classmethod
+    def bump_index_version(cls):
+        """Invalidate cached vector search results of all retrievers in this process"""
+        cls.index_version += 1
+        logger.info(f"Knowledge index version bumped to {cls.index_version}")
+    
+    @staticmethod
+    def _cache_key(structured_query: str) -> bytes:
+        """Hash a structured query into a compact cache key"""
+        return hashlib.blake2b(structured_query.encode(), digest_size=16).digest()
+    
+    async def _create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for several texts with one request"""
+        async with get_client(self.client) as client:
+            response = await client.post(
+                f"{self.base_url}/embedding/generate_embedding",
+                json={"texts": texts},
+                timeout=30.0
+            )
+            response.raise_for_status()
+            return response.json()["embeddings"]
+    
+    async def _search_knowledge(self, embeddings: List[List[float]]) -> List[List[Dict]]:
+        """Search the knowledge base for several embeddings with one request"""
+        async with get_client(self.client) as client:
+            response = await client.post(
+                f"{self.base_url}/vector_db/search_batch",
+                json={
+                    "query_embeddings": embeddings,
+                    "collection_name": "knowledge_base"
+                },
+                timeout=30.0
+            )
+            response.raise_for_status()
+            return response.json()["results"]
     
     async def _call_web_search(self, structured_query: str) -> Dict:
         """Call web search API and return results"""
         url = f"{self.base_url}/web_search/search_and_fetch"
         payload = {"structured_queries": [structured_query]}
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(url, json=payload)
+        async with get_client(self.client) as client:
+            response = await client.post(url, json=payload, timeout=30.0)
             if response.status_code == 200:
                 result = response.json()
                 return result.get("results", {})
@@ -30,52 +102,52 @@ class Retriever:
     
     async def _call_vector_search(self, structured_query: str) -> List[Dict]:
         """Call vector search pipeline: embedding -> vector_db -> rerank"""
-        # Step 1: Generate embedding
-        embedding_url = f"{self.base_url}/embedding/generate_embedding"
-        embedding_payload = {"texts": [structured_query]}
+        key = self._cache_key(structured_query)
+        results_key = (key, Retriever.index_version)
+        cached_chunks = self.results_cache.get(results_key)
+        if cached_chunks is not None:
+            logger.info("Vector search cache hit")
+            return cached_chunks
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Generate embedding
-            response = await client.post(embedding_url, json=embedding_payload)
-            if response.status_code != 200:
-                logger.error(f"Embedding generation failed with status {response.status_code}")
-                return []
-            
-            embedding_result = response.json()
-            query_embedding = embedding_result["embeddings"][0]
-            
-            # Step 2: Vector search
-            vector_search_url = f"{self.base_url}/vector_db/search"
-            vector_payload = {
-                "query_embedding": query_embedding,
-                "collection_name": "knowledge_base"
-            }
-            
-            response = await client.post(vector_search_url, json=vector_payload)
-            if response.status_code != 200:
-                logger.error(f"Vector search failed with status {response.status_code}")
-                return []
-            
-            vector_result = response.json()
-            chunks = vector_result.get("results", [])
-            
-            # Step 3: Rerank results
-            if not chunks:
+        # Step 1: Generate embedding
+        query_embedding = self.embedding_cache.get(key)
+        if query_embedding is None:
+            try:
+                query_embedding = await self.embedding_batcher.submit(structured_query)
+            except Exception as e:
+                logger.error(f"Embedding generation failed: {e}")
                 return []
-            
+            self.embedding_cache.set(key, query_embedding)
+        
+        # Step 2: Vector search
+        try:
+            chunks = await self.search_batcher.submit(query_embedding)
+        except Exception as e:
+            logger.error(f"Vector search failed: {e}")
+            return []
+        
+        # Step 3: Rerank results
+        if not chunks:
+            return []
+        
+        async with get_client(self.client) as client:
             rerank_url = f"{self.base_url}/rerank/rerank"
             rerank_payload = {
                 "query": structured_query,
                 "chunks": chunks
             }
             
-            response = await client.post(rerank_url, json=rerank_payload)
+            response = await client.post(rerank_url, json=rerank_payload, timeout=30.0)
             if response.status_code != 200:
                 logger.error(f"Reranking failed with status {response.status_code}")
                 return chunks  # Return original chunks if reranking fails
             
             rerank_result = response.json()
-            return rerank_result.get("reranked_chunks", [])
+            reranked_chunks = rerank_result.get("reranked_chunks", [])
+            
+            # Keyed by the index version seen at the start, so a re-index mid-flight is not cached
+            self.results_cache.set(results_key, reranked_chunks)
+            return reranked_chunks
     
     async def run(self, structured_query: str, 
                   web_search: bool = True, vector_search: bool = True) -> Dict:
@@ -1,18 +1,25 @@
 import httpx
 import json
 import asyncio
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from loguru import logger
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from workers.http_client import get_client
 
 class SaveConversation:
-    def __init__(self, base_url: str = "http://localhost:8001"):
+    def __init__(self, base_url: str = "http://localhost:8001", client: Optional[httpx.AsyncClient] = None):
         """
         Initialize SaveConversation with base URL for the tools API
 
         Args:
             base_url: Base URL for the tools and services API
+            client: Shared HTTP client, a short-lived one is created per call if not given
         """
         self.base_url = base_url
+        self.client = client
     
     async def run(self, user_id: str, conversation_id: str, query: str, answer: str) -> Dict[str, str]:
         """
@@ -36,8 +43,8 @@ class SaveConversation:
                 "answer": answer
             }
             
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(url, json=payload)
+            async with get_client(self.client) as client:
+                response = await client.post(url, json=payload, timeout=10.0)
                 response.raise_for_status()
                 result = response.json()
                 logger.info(f"Conversation saved successfully: {result}")
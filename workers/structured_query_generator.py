@@ -1,19 +1,31 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 import httpx
 import json
 import asyncio
 from loguru import logger
+from dotenv import load_dotenv
 import re
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from workers.http_client import get_client
+from workers.cache import LRUCache, normalize_query
+
+load_dotenv()
 
 class StructuredQueryGenerator:
-    def __init__(self, base_url: str = "http://localhost:8001"):
+    def __init__(self, base_url: str = "http://localhost:8001", client: Optional[httpx.AsyncClient] = None):
         """
         Initialize StructuredQueryGenerator with base URL for the tools API
 
         Args:
             base_url: Base URL for the tools and services API
+            client: Shared HTTP client, a short-lived one is created per call if not given
         """
         self.base_url = base_url
+        self.client = client
+        self.cache = LRUCache(int(os.getenv('QUERY_CACHE_SIZE', 4096)))
     
     def _parse_text_response(self, response_text: str) -> str:
         """
@@ -50,16 +62,23 @@ class StructuredQueryGenerator:
         Returns:
             str: Structured query string
         """
+        cache_key = normalize_query(query)
+        structured_query = self.cache.get(cache_key)
+        if structured_query is not None:
+            logger.info(f"Structured query cache hit: {structured_query}")
+            return structured_query
+        
         try:
             payload = {
                 "service_name": "structured_query_generator",
                 "query": query
             }
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
+            async with get_client(self.client) as client:
                 response = await client.post(
                     f"{self.base_url}/llm/generate_response",
-                    json=payload
+                    json=payload,
+                    timeout=30.0
                 )
                 response.raise_for_status()
                 response_text = response.json().get("response", "")
@@ -68,6 +87,9 @@ class StructuredQueryGenerator:
                 structured_query = self._parse_text_response(response_text)
                 logger.info(f"Generated structured query: {structured_query}")
                 
+                # Empty parses fall through to the retriever as-is, do not pin them
+                if structured_query:
+                    self.cache.set(cache_key, structured_query)
                 return structured_query
                 
         except Exception as e: